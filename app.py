@@ -5,17 +5,31 @@ ChatGPT OAuth PKCE 인증 기반
 """
 import os
 import sys
+import atexit
+import copy
+import hashlib
 import io
 import json
+import logging
+import logging.handlers
+import multiprocessing
+import pickle
+import queue
 import threading
+import time
+import traceback
 import uuid
-from flask import Flask, render_template, request, jsonify, send_from_directory
-from flask_cors import CORS
-
-from config import load_config, save_config, FONT_PATHS, DEFAULT_CONFIG, _DEFAULT_PROMPT_CHAPTER_SYSTEM, _DEFAULT_PROMPT_TOC_RULES, _DEFAULT_PROMPT_VALUE_SYSTEM, _DEFAULT_PROMPT_MARKETING_SYSTEM
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from flask import Flask, render_template, request, jsonify, send_from_directory, abort
+from werkzeug.security import safe_join
+
+from config import load_config, save_config, validate_config_updates, FONT_PATHS, DEFAULT_CONFIG, _DEFAULT_PROMPT_CHAPTER_SYSTEM, _DEFAULT_PROMPT_TOC_RULES, _DEFAULT_PROMPT_VALUE_SYSTEM, _DEFAULT_PROMPT_MARKETING_SYSTEM
 from modules.ai_engine import generate_ebook
 from modules.pdf_generator import EbookPDFGenerator, EbookDocxGenerator, EbookPptxGenerator
-from modules.hwpx_generator import EbookHwpxGenerator
+from modules.hwpx_generator import EbookHwpxGenerator, _INPUT_KEYS as _HWPX_INPUT_KEYS, _STYLE_KEYS as _HWPX_STYLE_KEYS
 from modules.oauth import (
     start_oauth_flow, get_login_status, get_valid_access_token, clear_tokens
 )
@@ -26,11 +40,323 @@ _BASE = sys._MEIPASS if getattr(sys, 'frozen', False) else os.path.dirname(os.pa
 app = Flask(__name__,
             static_folder=os.path.join(_BASE, 'static'),
             template_folder=os.path.join(_BASE, 'templates'))
-CORS(app)
+
+# CORS 헤더는 모든 응답에 같은 값이므로 미리 만들어 두고 그대로 붙임
+# (OPTIONS 프리플라이트는 Flask 가 각 라우트에 자동으로 응답)
+_CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
+    'Access-Control-Allow-Headers': 'Content-Type',
+}
+
+
+@app.after_request
+def _add_cors_headers(response):
+    response.headers.update(_CORS_HEADERS)
+    return response
+
+
+# ============================================================
+# 로그 출력
+# ============================================================
+def setup_logging(level=logging.INFO):
+    """
+    모듈 로그(logging)를 큐를 거쳐 stderr 로 출력 (실행 진입점에서 1회 호출)
+    작업 스레드는 큐에 넣기만 하고 포맷·쓰기는 리스너 스레드가 담당
+    """
+    root = logging.getLogger()
+    if any(isinstance(h, logging.handlers.QueueHandler) for h in root.handlers):
+        return
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    atexit.register(listener.stop)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+
+# ============================================================
+# 작업 저장소
+# ============================================================
+_MISSING = object()
+
+
+@dataclass(slots=True)
+class ProgressState:
+    """작업 진행 상태 - 생성 스레드가 같은 객체를 제자리에서 갱신"""
+    status: str
+    step: int
+    total_steps: int
+    message: str
+    topic: str
+    pdf_filename: str = None
+
+    def update(self, **fields):
+        """필드 갱신 후 진행 상태 스트림에 알림"""
+        with _progress_cond:
+            for name, value in fields.items():
+                setattr(self, name, value)
+            _progress_cond.notify_all()
+
+
+# 진행 상태가 바뀌면 /api/progress_stream 대기자를 깨움
+_progress_cond = threading.Condition()
+
+
+class _TaskStore:
+    """
+    task_id → 데이터 저장소 (LRU + TTL, 스레드 안전)
+    마지막 접근 후 ttl 초가 지났거나 maxsize 를 넘은 오래된 작업부터 제거
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()  # task_id → (마지막 접근 시각, 값)
+        self._lock = threading.RLock()
+
+    def _purge(self, now):
+        while self._data:
+            key, (ts, _) = next(iter(self._data.items()))
+            if len(self._data) <= self.maxsize and now - ts < self.ttl:
+                break
+            del self._data[key]
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            if now - item[0] >= self.ttl:
+                del self._data[key]
+                return default
+            self._data[key] = (now, item[1])
+            self._data.move_to_end(key)
+            return item[1]
+
+    def __getitem__(self, key):
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def __setitem__(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            self._data[key] = (now, value)
+            self._data.move_to_end(key)
+            self._purge(now)
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def pop(self, key, default=None):
+        with self._lock:
+            item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
 
 # 진행 상태 저장소
-progress_store = {}
-result_store = {}
+progress_store = _TaskStore(maxsize=1024, ttl=7200)
+result_store = _TaskStore(maxsize=256, ttl=7200)
+# (task_id, 'result' | 'edit') → 직렬화된 조회 응답 (결과가 바뀌면 폐기)
+_result_json_store = _TaskStore(maxsize=512, ttl=7200)
+
+
+def _result_json_response(task_id, kind, build):
+    body = _result_json_store.get((task_id, kind))
+    if body is None:
+        body = app.json.dumps({'success': True, 'data': build()}).encode('utf-8')
+        _result_json_store[(task_id, kind)] = body
+    return app.response_class(body, mimetype='application/json')
+
+
+def _invalidate_result_json(task_id):
+    _result_json_store.pop((task_id, 'result'))
+    _result_json_store.pop((task_id, 'edit'))
+
+# 진행 중인 OAuth 로그인 플로우
+_login_lock = threading.Lock()
+
+# 동시에 실행할 전자책 생성 작업 수 (초과 요청은 503 으로 거절)
+GEN_WORKERS = max(1, int(os.environ.get('GEN_WORKERS', 4)))
+_gen_slots = threading.BoundedSemaphore(GEN_WORKERS)
+
+# 출력 형식 → 생성기 클래스
+_GENERATORS = {
+    'pdf':  EbookPDFGenerator,
+    'docx': EbookDocxGenerator,
+    'pptx': EbookPptxGenerator,
+    'hwpx': EbookHwpxGenerator,
+}
+_FORMAT_LABELS = {
+    'pdf':  'PDF',
+    'docx': 'DOCX',
+    'pptx': 'PPTX',
+    'hwpx': '한글 파일(HWPX)',
+}
+
+# 형식별 파일 생성은 CPU 작업이므로 프로세스 풀에서 동시에 실행 (GIL 회피)
+_gen_pool = None
+_gen_pool_lock = threading.Lock()
+
+
+def _get_gen_pool():
+    global _gen_pool
+    with _gen_pool_lock:
+        if _gen_pool is None:
+            # spawn: 배포판(Windows exe)과 같은 방식으로 워커를 띄우고, 스레드가 도는 Flask
+            # 프로세스를 fork 할 때 생기는 락 교착을 피함
+            # 생성기 모듈의 상태(lru_cache 로 캐시한 XML 조각 등)는 워커마다 따로 가지며
+            # 메인 프로세스와 공유되지 않음 — 재사용 판단은 메인 프로세스에서 (_hwpx_reuse)
+            _gen_pool = ProcessPoolExecutor(
+                max_workers=len(_GENERATORS),
+                mp_context=multiprocessing.get_context('spawn'),
+            )
+        return _gen_pool
+
+
+def _reset_gen_pool():
+    global _gen_pool
+    with _gen_pool_lock:
+        _gen_pool = None
+
+
+def _run_generator(fmt, config, ebook_data):
+    """워커 프로세스에서 한 가지 형식의 파일 생성 → filename"""
+    _, filename = _GENERATORS[fmt](config).generate(ebook_data)
+    return filename
+
+
+def _run_generator_payload(fmt, payload):
+    config, ebook_data = pickle.loads(payload)
+    return _run_generator(fmt, config, ebook_data)
+
+
+# ─── HWPX 재사용 ───────────────────────────────────────────────
+# 같은 책 내용·서식 설정으로 만든 HWPX 가 그대로 남아 있으면 다시 만들지 않음
+# (생성은 워커 프로세스마다 따로 돌기 때문에 기록은 풀에 넘기기 전 메인 프로세스에서 관리)
+# 입력 해시 → (파일명, mtime_ns, 크기), 최근 것 _HWPX_REUSE_SIZE 개만 유지
+_HWPX_REUSE_SIZE = 16
+_hwpx_reuse = OrderedDict()
+_hwpx_reuse_lock = threading.Lock()
+
+
+def _hwpx_digest(config, ebook_data):
+    """
+    HWPX 생성기가 읽는 책 필드 + 서식 설정 + 출력 폴더의 blake2b 해시
+    (generated_files·pdf_filename 처럼 호출마다 바뀌는 기록용 키는 제외)
+    """
+    raw = json.dumps([
+        [ebook_data.get(k) for k in _HWPX_INPUT_KEYS],
+        [config.get(k) for k in _HWPX_STYLE_KEYS],
+        config.get('output_dir'),
+    ], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def _output_path(config, filename):
+    output_dir = config.get('output_dir', os.path.join(os.path.dirname(__file__), 'static', 'output'))
+    return os.path.join(output_dir, filename)
+
+
+def _reusable_hwpx(digest, config):
+    """같은 입력으로 만든 파일이 그 뒤로 바뀌지 않았으면 (mtime·크기 동일) 파일명 반환"""
+    with _hwpx_reuse_lock:
+        item = _hwpx_reuse.get(digest)
+    if item is None:
+        return None
+    filename, mtime_ns, size = item
+    try:
+        st = os.stat(_output_path(config, filename))
+    except OSError:
+        return None
+    if (st.st_mtime_ns, st.st_size) != (mtime_ns, size):
+        return None
+    return filename
+
+
+def _remember_hwpx(digest, config, filename):
+    try:
+        st = os.stat(_output_path(config, filename))
+    except OSError:
+        return
+    with _hwpx_reuse_lock:
+        _hwpx_reuse[digest] = (filename, st.st_mtime_ns, st.st_size)
+        _hwpx_reuse.move_to_end(digest)
+        while len(_hwpx_reuse) > _HWPX_REUSE_SIZE:
+            _hwpx_reuse.popitem(last=False)
+
+
+def _generate_one(fmt, config, ebook_data):
+    """현재 프로세스에서 한 가지 형식 생성 → (filename, None) 또는 (None, 오류 메시지)"""
+    digest = None
+    if fmt == 'hwpx':
+        digest = _hwpx_digest(config, ebook_data)
+        filename = _reusable_hwpx(digest, config)
+        if filename:
+            return filename, None
+    try:
+        filename = _run_generator(fmt, config, ebook_data)
+    except Exception as e:
+        return None, str(e)
+    if digest:
+        _remember_hwpx(digest, config, filename)
+    return filename, None
+
+
+def _generate_formats(formats, config, ebook_data):
+    """여러 형식을 동시에 생성하고 완료되는 순서대로 (fmt, filename, error) 반환"""
+    digest = None
+    if 'hwpx' in formats:
+        digest = _hwpx_digest(config, ebook_data)
+        filename = _reusable_hwpx(digest, config)
+        if filename:
+            formats = [fmt for fmt in formats if fmt != 'hwpx']
+            digest = None
+            yield 'hwpx', filename, None
+    if not formats:
+        return
+    pool = _get_gen_pool()
+    # 설정과 데이터는 한 번만 직렬화해 모든 워커에 같은 bytes 로 전달
+    payload = pickle.dumps((config, ebook_data), pickle.HIGHEST_PROTOCOL)
+    futures = {pool.submit(_run_generator_payload, fmt, payload): fmt for fmt in formats}
+    for fut in as_completed(futures):
+        fmt = futures[fut]
+        try:
+            filename = fut.result()
+            if fmt == 'hwpx' and digest:
+                _remember_hwpx(digest, config, filename)
+            yield fmt, filename, None
+        except BrokenProcessPool as e:
+            _reset_gen_pool()
+            yield fmt, None, e
+        except Exception as e:
+            yield fmt, None, e
+
+
+# 자주 폴링되는 응답의 직렬화 결과를 짧게 캐시: 이름 → (만료 시각, JSON bytes)
+_response_cache = {}
+_response_cache_lock = threading.Lock()
+
+
+def _cached_json_response(name, ttl, build):
+    now = time.monotonic()
+    with _response_cache_lock:
+        item = _response_cache.get(name)
+        if item is None or item[0] <= now:
+            item = (now + ttl, app.json.dumps(build()).encode('utf-8'))
+            _response_cache[name] = item
+    return app.response_class(item[1], mimetype='application/json')
+
+
+def _invalidate_cached_response(*names):
+    with _response_cache_lock:
+        for name in names:
+            _response_cache.pop(name, None)
 
 
 # ============================================================
@@ -66,17 +392,32 @@ def edit_page(task_id):
 # ============================================================
 @app.route('/api/auth/status')
 def auth_status():
-    login = get_login_status()
-    return jsonify({'success': True, **login})
+    return _cached_json_response('auth_status', 2, lambda: {'success': True, **get_login_status()})
 
 
 @app.route('/api/auth/login', methods=['POST'])
 def auth_login():
     def do_login():
-        start_oauth_flow()
-
-    thread = threading.Thread(target=do_login, daemon=True)
-    thread.start()
+        try:
+            start_oauth_flow()
+        finally:
+            _invalidate_cached_response('auth_status')
+            _login_lock.release()
+
+    # 콜백 포트(1455)를 쓰는 로그인 플로우는 한 번에 하나만 실행
+    if not _login_lock.acquire(blocking=False):
+        return jsonify({
+            'success': True,
+            'in_progress': True,
+            'message': '이미 로그인이 진행 중입니다. 열려 있는 브라우저 창에서 로그인을 완료해주세요.'
+        })
+    try:
+        thread = threading.Thread(target=do_login, daemon=True)
+        thread.start()
+    except BaseException:
+        # 스레드가 시작되지 않으면 do_login 의 finally 가 돌지 않으므로 여기서 해제
+        _login_lock.release()
+        raise
     return jsonify({
         'success': True,
         'message': '브라우저에서 ChatGPT 로그인 페이지가 열립니다. 로그인을 완료해주세요.'
@@ -86,6 +427,7 @@ def auth_login():
 @app.route('/api/auth/logout', methods=['POST'])
 def auth_logout():
     clear_tokens()
+    _invalidate_cached_response('auth_status')
     return jsonify({'success': True, 'message': '로그아웃되었습니다.'})
 
 
@@ -94,36 +436,22 @@ def auth_logout():
 # ============================================================
 @app.route('/api/config', methods=['GET'])
 def get_config():
-    config = load_config()
-    safe = {k: v for k, v in config.items() if k != 'openai_api_key'}
-    return jsonify({'success': True, 'config': safe})
+    def build():
+        config = load_config()
+        safe = {k: v for k, v in config.items() if k != 'openai_api_key'}
+        return {'success': True, 'config': safe}
+    return _cached_json_response('config', 2, build)
 
 
 @app.route('/api/config', methods=['POST'])
 def update_config():
-    data = request.json
-    updates = {}
-    allowed = [
-        'model', 'image_model',
-        'pdf_font', 'pdf_font_size', 'pdf_heading_size', 'pdf_subheading_size',
-        'pdf_line_spacing', 'pdf_margin_top', 'pdf_margin_bottom',
-        'pdf_margin_left', 'pdf_margin_right',
-        'target_pages_min', 'target_pages_max',
-        'prompt_chapter_system', 'prompt_toc_rules',
-        'prompt_value_system', 'prompt_marketing_system',
-    ]
-    for key in allowed:
-        if key in data:
-            val = data[key]
-            if key in ('pdf_font_size', 'pdf_heading_size', 'pdf_subheading_size',
-                       'pdf_margin_top', 'pdf_margin_bottom', 'pdf_margin_left', 'pdf_margin_right',
-                       'target_pages_min', 'target_pages_max'):
-                val = int(float(val))
-            elif key == 'pdf_line_spacing':
-                val = float(val)
-            updates[key] = val
+    try:
+        updates = validate_config_updates(request.json or {})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)})
 
     save_config(updates)
+    _invalidate_cached_response('config')
     return jsonify({'success': True, 'message': '설정이 저장되었습니다.'})
 
 
@@ -136,6 +464,7 @@ def reset_prompts():
         'prompt_marketing_system': _DEFAULT_PROMPT_MARKETING_SYSTEM,
     }
     save_config(defaults)
+    _invalidate_cached_response('config')
     return jsonify({'success': True, 'defaults': defaults})
 
 
@@ -239,110 +568,71 @@ def start_generation():
     if not token:
         return jsonify({'success': False, 'error': 'ChatGPT 로그인이 필요합니다. 먼저 로그인해주세요.'})
 
-    config = load_config()
-    model = config.get('model', 'gpt-5-codex')
-    task_id = str(uuid.uuid4())[:8]
-
-    progress_store[task_id] = {
-        'status': 'started',
-        'step': 0,
-        'total_steps': 6,
-        'message': '준비 중...',
-        'topic': topic,
-    }
+    if not _gen_slots.acquire(blocking=False):
+        response = jsonify({'success': False, 'error': '생성 작업이 많습니다. 잠시 후 다시 시도해주세요.'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
 
-    def run_generation():
-        def on_progress(step, total, msg, data=None):
-            progress_store[task_id] = {
-                'status': 'running',
-                'step': step,
-                'total_steps': total,
-                'message': msg,
-                'topic': topic,
-            }
+    # 슬롯 확보 후 작업 스레드가 시작되기 전에 실패하면 (설정 읽기·스레드 생성 실패 등)
+    # run_generation 의 finally 가 돌지 않으므로 여기서 반납 (안 하면 슬롯이 영구히 줄어듦)
+    try:
+        config = load_config()
+        model = config.get('model', 'gpt-5-codex')
+        task_id = str(uuid.uuid4())[:8]
 
-        try:
-            ebook_data = generate_ebook(model, topic, include_images, on_progress, config=config,
-                                        reference_materials=reference_materials)
-
-            if ebook_data.get('error'):
-                progress_store[task_id] = {
-                    'status': 'error',
-                    'message': f"생성 실패: {ebook_data['error']}",
-                    'topic': topic,
-                }
-                result_store[task_id] = ebook_data
-                return
+        progress = ProgressState('started', 0, 6, '준비 중...', topic)
+        progress_store[task_id] = progress
 
-            ebook_data['generated_files'] = {}
+        def run_generation():
+            def on_progress(step, total, msg, data=None):
+                progress.update(status='running', step=step, total_steps=total, message=msg)
 
-            # PDF 생성
-            if 'pdf' in output_formats:
-                progress_store[task_id]['message'] = 'PDF 파일 생성 중...'
-                try:
-                    generator = EbookPDFGenerator(config)
-                    filepath, filename = generator.generate(ebook_data)
-                    ebook_data['generated_files']['pdf'] = filename
-                    ebook_data['pdf_filename'] = filename  # 하위 호환
-                except Exception as e:
-                    print(f"[PDF 생성 오류] {e}")
-                    ebook_data['generated_files']['pdf'] = None
-
-            # DOCX 생성
-            if 'docx' in output_formats:
-                progress_store[task_id]['message'] = 'DOCX 파일 생성 중...'
-                try:
-                    gen = EbookDocxGenerator(config)
-                    filepath, filename = gen.generate(ebook_data)
-                    ebook_data['generated_files']['docx'] = filename
-                except Exception as e:
-                    print(f"[DOCX 생성 오류] {e}")
-                    ebook_data['generated_files']['docx'] = None
-
-            # PPTX 생성
-            if 'pptx' in output_formats:
-                progress_store[task_id]['message'] = 'PPTX 파일 생성 중...'
-                try:
-                    gen = EbookPptxGenerator(config)
-                    filepath, filename = gen.generate(ebook_data)
-                    ebook_data['generated_files']['pptx'] = filename
-                except Exception as e:
-                    print(f"[PPTX 생성 오류] {e}")
-                    ebook_data['generated_files']['pptx'] = None
-
-            # HWPX 생성
-            if 'hwpx' in output_formats:
-                progress_store[task_id]['message'] = '한글 파일(HWPX) 생성 중...'
-                try:
-                    gen = EbookHwpxGenerator(config)
-                    filepath, filename = gen.generate(ebook_data)
-                    ebook_data['generated_files']['hwpx'] = filename
-                except Exception as e:
-                    print(f"[HWPX 생성 오류] {e}")
-                    ebook_data['generated_files']['hwpx'] = None
-
-            result_store[task_id] = ebook_data
-
-            progress_store[task_id] = {
-                'status': 'completed',
-                'step': progress_store[task_id].get('total_steps', 6),
-                'total_steps': progress_store[task_id].get('total_steps', 6),
-                'message': '전자책 생성 완료!',
-                'topic': topic,
-                'pdf_filename': ebook_data.get('pdf_filename'),
-            }
+            try:
+                ebook_data = generate_ebook(model, topic, include_images, on_progress, config=config,
+                                            reference_materials=reference_materials)
+
+                if ebook_data.get('error'):
+                    progress.update(status='error', message=f"생성 실패: {ebook_data['error']}")
+                    result_store[task_id] = ebook_data
+                    return
+
+                ebook_data['generated_files'] = {}
+
+                # PDF / DOCX / PPTX / HWPX 동시 생성
+                formats = [fmt for fmt in _GENERATORS if fmt in output_formats]
+                if formats:
+                    labels = ', '.join(_FORMAT_LABELS[fmt] for fmt in formats)
+                    progress.update(message=f'{labels} 파일 생성 중...')
+                for fmt, filename, error in _generate_formats(formats, config, ebook_data):
+                    if error:
+                        print(f"[{fmt.upper()} 생성 오류] {error}")
+                    ebook_data['generated_files'][fmt] = filename
+                    if fmt == 'pdf' and filename:
+                        ebook_data['pdf_filename'] = filename  # 하위 호환
+                    progress.update(message=f'{_FORMAT_LABELS[fmt]} 파일 생성 완료')
 
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            progress_store[task_id] = {
-                'status': 'error',
-                'message': f'오류 발생: {str(e)}',
-                'topic': topic,
-            }
+                result_store[task_id] = ebook_data
 
-    thread = threading.Thread(target=run_generation, daemon=True)
-    thread.start()
+                progress.update(
+                    status='completed',
+                    step=progress.total_steps,
+                    message='전자책 생성 완료!',
+                    pdf_filename=ebook_data.get('pdf_filename'),
+                )
+
+            except Exception as e:
+                traceback.print_exc()
+                progress.update(status='error', message=f'오류 발생: {str(e)}')
+            finally:
+                _gen_slots.release()
+
+        # 종료 시 대기하지 않도록 daemon 스레드 유지 (동시 실행 수는 _gen_slots 로 제한)
+        thread = threading.Thread(target=run_generation, daemon=True)
+        thread.start()
+    except BaseException:
+        _gen_slots.release()
+        raise
 
     return jsonify({'success': True, 'task_id': task_id, 'message': '전자책 생성을 시작합니다.'})
 
@@ -352,7 +642,43 @@ def get_progress(task_id):
     data = progress_store.get(task_id)
     if not data:
         return jsonify({'success': False, 'error': '작업을 찾을 수 없습니다.'})
-    return jsonify({'success': True, 'data': data})
+    # 진행 상태가 바뀌지 않았으면 304 로 본문 생략
+    response = jsonify({'success': True, 'data': asdict(data)})
+    response.add_etag(weak=True)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+@app.route('/api/progress_stream/<task_id>')
+def progress_stream(task_id):
+    """진행 상태를 Server-Sent Events 로 전송 (바뀔 때만 전송, 15초마다 keepalive)"""
+    def sse(payload):
+        return f'data: {app.json.dumps(payload)}\n\n'
+
+    def events():
+        last = None
+        while True:
+            state = progress_store.get(task_id)
+            if state is None:
+                yield sse({'success': False, 'error': '작업을 찾을 수 없습니다.'})
+                return
+            with _progress_cond:
+                snapshot = asdict(state)
+                if snapshot == last:
+                    _progress_cond.wait(timeout=15)
+                    snapshot = asdict(state)
+            if snapshot == last:
+                yield ': keepalive\n\n'
+                continue
+            last = snapshot
+            yield sse({'success': True, 'data': snapshot})
+            if snapshot['status'] in ('completed', 'error'):
+                return
+
+    return app.response_class(events(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no',
+    })
 
 
 @app.route('/api/result/<task_id>')
@@ -360,7 +686,7 @@ def get_result(task_id):
     data = result_store.get(task_id)
     if not data:
         return jsonify({'success': False, 'error': '결과를 찾을 수 없습니다.'})
-    safe = {
+    return _result_json_response(task_id, 'result', lambda: {
         'topic': data.get('topic'),
         'analysis': data.get('analysis'),
         'book_info': data.get('book_info'),
@@ -370,15 +696,27 @@ def get_result(task_id):
         'generated_files': data.get('generated_files', {}),
         'chapters_count': len(data.get('chapters_content', [])),
         'error': data.get('error'),
-    }
-    return jsonify({'success': True, 'data': safe})
+    })
 
 
 @app.route('/api/download/<filename>')
 def download_file(filename):
     config = load_config()
     output_dir = config.get('output_dir', os.path.join(os.path.dirname(__file__), 'static', 'output'))
-    return send_from_directory(output_dir, filename, as_attachment=True)
+    # 같은 제목으로 재생성하면 파일명이 그대로이므로 장기 캐시 대신 ETag 재검증 (변경 없으면 304)
+    # ETag 는 send_from_directory 에 넘겨야 Range + If-Range 이어받기(206)도 같은 값으로 판단됨
+    # (stat 도 send_from_directory 와 같은 safe_join 경로로 - 폴더 밖 경로 차단)
+    path = safe_join(output_dir, filename)
+    if path is None:
+        abort(404)
+    try:
+        st = os.stat(os.path.join(app.root_path, path))
+    except OSError:
+        abort(404)
+    response = send_from_directory(output_dir, filename, as_attachment=True, conditional=True,
+                                   etag=f'{st.st_mtime_ns ^ st.st_size:x}')
+    response.cache_control.no_cache = True
+    return response
 
 
 # ============================================================
@@ -390,14 +728,13 @@ def get_edit_content(task_id):
     data = result_store.get(task_id)
     if not data:
         return jsonify({'success': False, 'error': '결과를 찾을 수 없습니다.'})
-    content = {
+    return _result_json_response(task_id, 'edit', lambda: {
         'topic': data.get('topic'),
         'book_info': data.get('book_info'),
         'chapters_content': data.get('chapters_content', []),
         'analysis': data.get('analysis'),
         'marketing': data.get('marketing'),
-    }
-    return jsonify({'success': True, 'data': content})
+    })
 
 
 @app.route('/api/edit/<task_id>', methods=['POST'])
@@ -413,53 +750,29 @@ def save_edit_content(task_id):
     if 'book_info' in updates:
         data['book_info'].update(updates['book_info'])
     if 'chapters_content' in updates:
-        chapters_content = updates['chapters_content']
-        for i, ch_update in enumerate(chapters_content):
-            if i < len(data['chapters_content']):
-                if 'content' in ch_update:
-                    data['chapters_content'][i]['content'] = ch_update['content']
-                if 'chapter' in ch_update:
-                    data['chapters_content'][i]['chapter'].update(ch_update['chapter'])
+        # zip 이 기존 챕터 수를 넘는 항목을 자동으로 건너뜀
+        for ch, ch_update in zip(data['chapters_content'], updates['chapters_content']):
+            if 'content' in ch_update:
+                ch['content'] = ch_update['content']
+            if 'chapter' in ch_update:
+                ch['chapter'].update(ch_update['chapter'])
 
     config = load_config()
     output_formats = updates.get('output_formats', ['pdf'])
     data['generated_files'] = {}
 
-    # 재생성
-    if 'pdf' in output_formats:
-        try:
-            gen = EbookPDFGenerator(config)
-            filepath, filename = gen.generate(data)
-            data['generated_files']['pdf'] = filename
+    # 요청된 형식 동시 재생성
+    formats = [fmt for fmt in _GENERATORS if fmt in output_formats]
+    for fmt, filename, error in _generate_formats(formats, config, data):
+        if error:
+            print(f"[재생성 {fmt.upper()} 오류] {error}")
+            continue
+        data['generated_files'][fmt] = filename
+        if fmt == 'pdf':
             data['pdf_filename'] = filename
-        except Exception as e:
-            print(f"[재생성 PDF 오류] {e}")
-
-    if 'docx' in output_formats:
-        try:
-            gen = EbookDocxGenerator(config)
-            filepath, filename = gen.generate(data)
-            data['generated_files']['docx'] = filename
-        except Exception as e:
-            print(f"[재생성 DOCX 오류] {e}")
-
-    if 'pptx' in output_formats:
-        try:
-            gen = EbookPptxGenerator(config)
-            filepath, filename = gen.generate(data)
-            data['generated_files']['pptx'] = filename
-        except Exception as e:
-            print(f"[재생성 PPTX 오류] {e}")
-
-    if 'hwpx' in output_formats:
-        try:
-            gen = EbookHwpxGenerator(config)
-            filepath, filename = gen.generate(data)
-            data['generated_files']['hwpx'] = filename
-        except Exception as e:
-            print(f"[재생성 HWPX 오류] {e}")
 
     result_store[task_id] = data
+    _invalidate_result_json(task_id)
     return jsonify({
         'success': True,
         'message': '저장 및 재생성 완료',
@@ -477,223 +790,85 @@ def regenerate_format(task_id):
     data = result_store[task_id]
     config = load_config()
 
-    try:
-        if fmt == 'pdf':
-            gen = EbookPDFGenerator(config)
-        elif fmt == 'docx':
-            gen = EbookDocxGenerator(config)
-        elif fmt == 'pptx':
-            gen = EbookPptxGenerator(config)
-        elif fmt == 'hwpx':
-            gen = EbookHwpxGenerator(config)
-        else:
-            return jsonify({'success': False, 'error': f'지원하지 않는 형식: {fmt}'})
+    if fmt not in _GENERATORS:
+        return jsonify({'success': False, 'error': f'지원하지 않는 형식: {fmt}'})
 
-        filepath, filename = gen.generate(data)
-        if 'generated_files' not in data:
-            data['generated_files'] = {}
-        data['generated_files'][fmt] = filename
-        if fmt == 'pdf':
-            data['pdf_filename'] = filename
-        result_store[task_id] = data
-        return jsonify({'success': True, 'filename': filename})
-    except Exception as e:
-        return jsonify({'success': False, 'error': str(e)})
+    filename, error = _generate_one(fmt, config, data)
+    if error:
+        return jsonify({'success': False, 'error': error})
+    data.setdefault('generated_files', {})[fmt] = filename
+    if fmt == 'pdf':
+        data['pdf_filename'] = filename
+    result_store[task_id] = data
+    _invalidate_result_json(task_id)
+    return jsonify({'success': True, 'filename': filename})
 
 
 # ============================================================
 # 테스트 모드 API
 # ============================================================
+# 테스트 모드용 더미 전자책 데이터 (모듈 로드 시 한 번만 읽음)
+with open(os.path.join(_BASE, 'static', 'fixtures', 'test_ebook.json'), encoding='utf-8') as _f:
+    _TEST_EBOOK_DATA = json.load(_f)
+
+# (설정 해시, 형식) → (파일명, 생성 당시 mtime_ns): 설정과 파일이 그대로면 재생성 생략
+_test_file_cache = {}
+
+
+def _config_digest(config):
+    return hashlib.blake2b(json.dumps(config, sort_keys=True, default=str).encode('utf-8'),
+                           digest_size=16).hexdigest()
+
+
+def _cached_test_file(key, output_dir):
+    cached = _test_file_cache.get(key)
+    if not cached:
+        return None
+    filename, mtime_ns = cached
+    try:
+        if os.stat(os.path.join(output_dir, filename)).st_mtime_ns == mtime_ns:
+            return filename
+    except OSError:
+        pass
+    return None
+
+
 @app.route('/api/test_generate', methods=['POST'])
 def test_generate():
     """더미 데이터로 즉시 모든 형식 생성 (AI 호출 없음)"""
     config = load_config()
     task_id = 'test_' + str(uuid.uuid4())[:6]
 
-    ebook_data = {
-        'topic': '직장인 퇴근 후 월 100만원 부수입 만들기',
-        'book_info': {
-            'book_title': '퇴근 후 100만원 만들기',
-            'subtitle': '직장인을 위한 부수입 실전 가이드',
-            'author': 'AI 전자책 생성기',
-            'chapters': [
-                {'chapter_num': 1, 'title': '왜 지금 부수입이 필요한가', 'phase': '문제인식'},
-                {'chapter_num': 2, 'title': '나에게 맞는 부수입 방법 찾기', 'phase': '방법발견'},
-                {'chapter_num': 3, 'title': '첫 달 수입 만들기: 실전 30일', 'phase': '실행'},
-                {'chapter_num': 4, 'title': '수입을 안정화하고 확장하기', 'phase': '확신'},
-            ],
-            'reader_psychology': {
-                'concerns': ['시간이 없다', '무엇부터 시작할지 모른다', '실패할까 두렵다'],
-                'expectations': ['안정적인 추가 수입', '본업에 지장 없는 방법', '검증된 노하우'],
-                'fears': ['사기당할까봐', '시간 낭비가 될까봐', '가족에게 부담이 될까봐'],
-            },
-        },
-        'chapters_content': [
-            {
-                'chapter': {
-                    'chapter_num': 1, 'title': '왜 지금 부수입이 필요한가',
-                    'phase': '문제인식',
-                    'before_state': '월급만으로는 부족하다는 막막함',
-                    'after_state': '부수입의 필요성과 가능성을 명확히 이해',
-                },
-                'content': (
-                    "== 월급의 한계 ==\n\n"
-                    "현대 직장인의 가장 큰 고민은 '월급으로는 부족하다'는 현실입니다. "
-                    "물가는 오르고 생활비는 늘지만 월급 인상률은 이를 따라가지 못합니다.\n\n"
-                    "[핵심 포인트] 월급만 바라보는 삶의 위험성\n\n"
-                    "- 물가 상승률 연 3~5%, 평균 임금 인상률은 2~3%\n"
-                    "- 하나의 수입원에 의존하면 갑작스런 실직에 취약\n"
-                    "- 부수입 없이는 노후 준비가 사실상 불가능\n\n"
-                    "== 부수입이 바꾸는 삶 ==\n\n"
-                    "부수입 월 100만원은 단순한 추가 금액이 아닙니다. "
-                    "심리적 안정감과 선택의 자유를 가져다줍니다.\n\n"
-                    "[실전 팁] 100만원의 진짜 의미\n\n"
-                    "연간 1,200만원은 20년이면 2억 4천만원 이상의 차이를 만들어냅니다.\n\n"
-                    "- 복리 효과: 일찍 시작할수록 결과가 크다\n"
-                    "- 스킬 축적: 시간이 지날수록 더 쉬워진다\n"
-                    "- 네트워크 형성: 부수입 활동을 통한 인맥 확장"
-                ),
-            },
-            {
-                'chapter': {
-                    'chapter_num': 2, 'title': '나에게 맞는 부수입 방법 찾기',
-                    'phase': '방법발견',
-                    'before_state': '어떤 방법이 맞는지 몰라 망설임',
-                    'after_state': '자신의 상황에 최적화된 방법 선택 완료',
-                },
-                'content': (
-                    "== 디지털 부수입 ==\n\n"
-                    "인터넷만 있으면 시작할 수 있는 방법들이 폭발적으로 늘었습니다.\n\n"
-                    "- 전자책 출판: 전문 지식을 PDF로 판매\n"
-                    "- 온라인 강의: 유데미, 클래스101 플랫폼 활용\n"
-                    "- 블로그/유튜브: 광고 수익과 협찬\n"
-                    "- 프리랜서: 크몽, 탈잉에서 전문 스킬 판매\n\n"
-                    "== 오프라인 부수입 ==\n\n"
-                    "디지털이 익숙하지 않다면 오프라인에서도 기회가 충분합니다.\n\n"
-                    "- 중고 거래: 집 안 물건 정리하며 수입 창출\n"
-                    "- 재능 공유: 요리, 운동, 악기 개인 레슨\n"
-                    "- 단기 알바: 주말 이벤트 스태프\n\n"
-                    "[핵심 포인트] 선택 기준 4가지\n\n"
-                    "1. 현재 보유 스킬과 지식\n"
-                    "2. 투자 가능 시간 (주당 5~10시간)\n"
-                    "3. 초기 투자 비용 (0~50만원)\n"
-                    "4. 빠른 수익화 가능 여부"
-                ),
-            },
-            {
-                'chapter': {
-                    'chapter_num': 3, 'title': '첫 달 수입 만들기: 실전 30일',
-                    'phase': '실행',
-                    'before_state': '계획만 있고 실행을 못하는 상태',
-                    'after_state': '첫 번째 수입을 실제로 만들어낸 경험',
-                },
-                'content': (
-                    "== 30일 행동 계획 ==\n\n"
-                    "이론보다 실행이 중요합니다. 다음 계획을 그대로 따라하면 첫 수입을 만들 수 있습니다.\n\n"
-                    "[1주차] 기반 다지기\n\n"
-                    "- 판매할 상품/서비스 1개 확정\n"
-                    "- 플랫폼 계정 생성 및 프로필 완성\n"
-                    "- 첫 포스팅 또는 상품 등록\n\n"
-                    "[2주차] 첫 고객 만들기\n\n"
-                    "- 지인 10명에게 소개\n"
-                    "- SNS 홍보 시작\n"
-                    "- 첫 피드백 수집 및 개선\n\n"
-                    "[3주차] 수익 창출\n\n"
-                    "- 가격 정책 최적화\n"
-                    "- 반복 구매 유도 전략 실행\n"
-                    "- 리뷰 수집 및 신뢰 구축\n\n"
-                    "[4주차] 확장\n\n"
-                    "- 성과 분석 및 개선점 파악\n"
-                    "- 두 번째 상품/서비스 기획\n"
-                    "- 자동화 시스템 구축 시작"
-                ),
-            },
-            {
-                'chapter': {
-                    'chapter_num': 4, 'title': '수입을 안정화하고 확장하기',
-                    'phase': '확신',
-                    'before_state': '불규칙한 수입으로 인한 불안감',
-                    'after_state': '안정적이고 성장하는 부수입 시스템 완성',
-                },
-                'content': (
-                    "== 수입 안정화 전략 ==\n\n"
-                    "첫 수입을 만들었다면 이제 안정화하고 성장시켜야 합니다.\n\n"
-                    "[핵심 포인트] 패시브 인컴으로의 전환\n\n"
-                    "처음에는 시간을 팔지만, 궁극적으로는 자동으로 수입이 들어오는 구조를 만들어야 합니다.\n\n"
-                    "== 3단계 성장 로드맵 ==\n\n"
-                    "1단계: 활성 수입 (시간 = 돈)\n"
-                    "- 프리랜서, 레슨, 단기 알바 → 월 30~50만원\n\n"
-                    "2단계: 반패시브 수입\n"
-                    "- 전자책, 온라인 강의, 블로그 → 월 70~100만원\n\n"
-                    "3단계: 패시브 수입\n"
-                    "- 배당주, 부동산 수익, 로열티 → 월 100만원 이상\n\n"
-                    "[실전 팁] 수입 다각화\n\n"
-                    "- 최소 3개 이상의 수입원 유지\n"
-                    "- 디지털 + 오프라인 조합 권장\n"
-                    "- 월 1회 성과 리뷰 및 전략 수정"
-                ),
-            },
-        ],
-        'analysis': {
-            'free_vs_paid': {
-                'verdict': '유료 전환 강력 추천',
-                'paid_conversion_points': [
-                    '검증된 실전 경험과 노하우 담김',
-                    '30일 행동 계획 등 즉시 실행 가능한 콘텐츠',
-                    '실패 사례와 해결책 포함',
-                ],
-            },
-            'problem_solved': {
-                'time': '수개월의 시행착오를 수주로 단축',
-                'money': '잘못된 투자 방지로 수십만원 절약',
-                'emotion': '막막함에서 명확한 로드맵으로',
-            },
-            'why_pay': '이 책은 수천 시간의 실전 경험을 압축한 결과물입니다.',
-            'target_reader': '부수입을 원하지만 어디서 시작할지 모르는 20~40대 직장인',
-        },
-        'marketing': {
-            'sales_copy': '퇴근 후 2시간으로 월 100만원을 만드는 직장인들의 비밀을 공개합니다.',
-            'content_topics': [
-                {'topic': '월급만으로 부족한 직장인의 현실', 'hook_sentence': '"월급날이 두렵다면, 당신만 그런 게 아닙니다"'},
-                {'topic': '퇴근 후 2시간 활용법', 'hook_sentence': '"하루 2시간이 1년 후 재정을 바꿉니다"'},
-            ],
-            'natural_distribution': {
-                'blog_questions': ['직장인 부업 추천', '월급 외 수입 만들기'],
-                'community_complaints': ['월급이 너무 적어요', '부업 뭐가 좋을까요'],
-                'sns_consumption': ['수입 인증', '부업 성공 스토리'],
-            },
-            'value_summary': {
-                'time_saved': '6개월 시행착오 단축',
-                'money_saved': '잘못된 투자 30만원 절약',
-                'mistakes_prevented': '흔한 실수 10가지 예방',
-            },
-        },
-        'cover_url': None,
-        'generated_files': {},
-    }
+    ebook_data = copy.deepcopy(_TEST_EBOOK_DATA)
+
+    output_dir = config.get('output_dir', os.path.join(os.path.dirname(__file__), 'static', 'output'))
+    digest = _config_digest(config)
+    pending = []
+    for fmt in _GENERATORS:
+        filename = _cached_test_file((digest, fmt), output_dir)
+        if filename:
+            ebook_data['generated_files'][fmt] = filename
+        else:
+            pending.append(fmt)
 
     errors = {}
-    for fmt, GenClass in [
-        ('pdf',  EbookPDFGenerator),
-        ('docx', EbookDocxGenerator),
-        ('pptx', EbookPptxGenerator),
-        ('hwpx', EbookHwpxGenerator),
-    ]:
+    for fmt, filename, error in _generate_formats(pending, config, ebook_data):
+        if error:
+            traceback.print_exception(error)
+            errors[fmt] = str(error)
+            continue
+        ebook_data['generated_files'][fmt] = filename
         try:
-            gen = GenClass(config)
-            _, filename = gen.generate(ebook_data)
-            ebook_data['generated_files'][fmt] = filename
-            if fmt == 'pdf':
-                ebook_data['pdf_filename'] = filename
-        except Exception as e:
-            import traceback; traceback.print_exc()
-            errors[fmt] = str(e)
+            mtime_ns = os.stat(os.path.join(output_dir, filename)).st_mtime_ns
+            _test_file_cache[(digest, fmt)] = (filename, mtime_ns)
+        except OSError:
+            pass
+
+    if 'pdf' in ebook_data['generated_files']:
+        ebook_data['pdf_filename'] = ebook_data['generated_files']['pdf']
 
     result_store[task_id] = ebook_data
-    progress_store[task_id] = {
-        'status': 'completed', 'step': 6, 'total_steps': 6,
-        'message': '테스트 생성 완료!', 'topic': ebook_data['topic'],
-    }
+    progress_store[task_id] = ProgressState('completed', 6, 6, '테스트 생성 완료!', ebook_data['topic'])
 
     return jsonify({
         'success': True,
@@ -707,6 +882,8 @@ def test_generate():
 # 실행
 # ============================================================
 if __name__ == '__main__':
+    multiprocessing.freeze_support()
+    setup_logging()
     config = load_config()
     os.makedirs(config.get('output_dir', './static/output'), exist_ok=True)
     print(f"\n  전자책 자동 생성기 실행 중!")
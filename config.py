@@ -1,7 +1,9 @@
 import os
 import sys
 import json
+import math
 import platform
+import threading
 
 # frozen(EXE) 모드에서는 실행파일 디렉토리에 설정 저장 (영구 보존)
 # 개발 모드에서는 소스 디렉토리에 저장
@@ -58,6 +60,8 @@ DEFAULT_CONFIG = {
     # 목표 페이지 수
     'target_pages_min': 100,
     'target_pages_max': 150,
+    # 챕터 본문·이미지 동시 요청 수
+    'chapter_concurrency': 4,
     # 커스터마이즈 가능한 AI 프롬프트
     'prompt_chapter_system': _DEFAULT_PROMPT_CHAPTER_SYSTEM,
     'prompt_toc_rules': _DEFAULT_PROMPT_TOC_RULES,
@@ -76,21 +80,101 @@ FONT_PATHS = {
 }
 
 
+# 사용자가 변경 가능한 설정 키 (형식별)
+_INT_FIELDS = frozenset({
+    'pdf_font_size', 'pdf_heading_size', 'pdf_subheading_size',
+    'pdf_margin_top', 'pdf_margin_bottom', 'pdf_margin_left', 'pdf_margin_right',
+    'target_pages_min', 'target_pages_max',
+})
+_FLOAT_FIELDS = frozenset({'pdf_line_spacing'})
+# 0 이하이면 레이아웃 계산이 0 나눗셈·음수 크기가 되는 키
+_POSITIVE_FIELDS = frozenset({
+    'pdf_font_size', 'pdf_heading_size', 'pdf_subheading_size', 'pdf_line_spacing',
+})
+_STR_FIELDS = frozenset({
+    'model', 'image_model', 'pdf_font',
+    'prompt_chapter_system', 'prompt_toc_rules',
+    'prompt_value_system', 'prompt_marketing_system',
+})
+
+
+def validate_config_updates(data):
+    """
+    요청 데이터에서 변경 가능한 키만 골라 형 변환
+    반환: 갱신할 설정 dict / 값이 잘못되면 ValueError
+    """
+    updates = {}
+    for key, val in data.items():
+        if key in _INT_FIELDS:
+            if type(val) is not int:
+                # JSON 숫자는 그대로, 문자열('12.0' 등)만 float 을 거쳐 변환
+                # (1e999·inf 는 OverflowError, NaN 은 ValueError)
+                try:
+                    val = int(float(val))
+                except (TypeError, ValueError, OverflowError):
+                    raise ValueError(f'{key}: 숫자를 입력해주세요.')
+        elif key in _FLOAT_FIELDS:
+            try:
+                val = float(val)
+            except (TypeError, ValueError, OverflowError):
+                raise ValueError(f'{key}: 숫자를 입력해주세요.')
+            # NaN·inf 는 저장되면 이후 모든 문서 생성이 int() 변환에서 실패
+            if not math.isfinite(val):
+                raise ValueError(f'{key}: 숫자를 입력해주세요.')
+        elif key in _STR_FIELDS:
+            if not isinstance(val, str):
+                raise ValueError(f'{key}: 문자열이어야 합니다.')
+        else:
+            continue
+        if key in _POSITIVE_FIELDS and val <= 0:
+            raise ValueError(f'{key}: 0보다 큰 값을 입력해주세요.')
+        updates[key] = val
+    return updates
+
+
+# 파싱된 설정 캐시 (user_config.json 의 mtime 이 바뀔 때만 다시 읽음)
+_cache = {'mtime': None, 'data': None}
+_lock = threading.Lock()
+
+
+def _config_mtime():
+    try:
+        return os.stat(CONFIG_FILE).st_mtime_ns
+    except OSError:
+        return None
+
+
 def load_config():
-    config = DEFAULT_CONFIG.copy()
-    if os.path.exists(CONFIG_FILE):
-        try:
-            with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
-                saved = json.load(f)
-            config.update(saved)
-        except Exception:
-            pass
-    return config
+    mtime = _config_mtime()
+    with _lock:
+        if _cache['data'] is not None and _cache['mtime'] == mtime:
+            return _cache['data'].copy()
+
+        config = DEFAULT_CONFIG.copy()
+        if mtime is not None:
+            try:
+                with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                config.update(saved)
+            except Exception:
+                pass
+        _cache['mtime'] = mtime
+        _cache['data'] = config
+        return config.copy()
 
 
 def save_config(updates):
     config = load_config()
     config.update(updates)
-    with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
-        json.dump(config, f, ensure_ascii=False, indent=2)
+    with _lock:
+        # 바뀐 값이 없으면 디스크에 다시 쓰지 않음
+        if config == _cache['data'] and _cache['mtime'] is not None:
+            return config
+        text = json.dumps(config, ensure_ascii=False, indent=2)
+        with open(CONFIG_FILE, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            mtime = os.fstat(f.fileno()).st_mtime_ns
+        _cache['mtime'] = mtime
+        _cache['data'] = config.copy()
     return config
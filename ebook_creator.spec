@@ -26,7 +26,6 @@ a = Analysis(
         # Flask 관련
         'flask',
         'flask.templating',
-        'flask_cors',
         'jinja2',
         'jinja2.ext',
         'werkzeug',
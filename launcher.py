@@ -5,6 +5,7 @@ Flask 서버를 시작하고 기본 브라우저에서 자동으로 엽니다.
 import sys
 import os
 import threading
+import multiprocessing
 import webbrowser
 import time
 
@@ -52,9 +53,11 @@ def main():
     print()
 
     # Flask 앱 import 및 실행
-    from app import app
+    from app import app, setup_logging
     from config import load_config
 
+    setup_logging()
+
     config = load_config()
     # 출력 디렉토리를 앱 디렉토리 기준으로 재설정
     config['output_dir'] = output_dir
@@ -63,4 +66,6 @@ def main():
 
 
 if __name__ == '__main__':
+    # 형식별 파일 생성 프로세스 풀이 EXE 를 다시 실행할 때 런처가 재시작되지 않도록
+    multiprocessing.freeze_support()
     main()
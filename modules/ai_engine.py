@@ -3,20 +3,62 @@ AI 전자책 생성 엔진
 12개 프롬프트 원칙을 단계별로 실행하여 상품성 있는 전자책을 생성
 ChatGPT OAuth 토큰 → chatgpt.com/backend-api/codex/responses (SSE stream)
 """
+import hashlib
 import json
+import logging
+import os
+import random
 import re
 import time
 import uuid
-import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from itertools import islice
 import requests as http_requests
+from requests.adapters import HTTPAdapter
+from config import (
+    _DEFAULT_PROMPT_CHAPTER_SYSTEM, _DEFAULT_PROMPT_TOC_RULES,
+    _DEFAULT_PROMPT_VALUE_SYSTEM, _DEFAULT_PROMPT_MARKETING_SYSTEM,
+)
 from modules.oauth import get_valid_access_token, extract_account_id
 
+log = logging.getLogger(__name__)
+
+# 응답 JSON 파싱 - orjson 이 설치돼 있으면 사용 (SSE 프레임마다 호출되는 경로)
+# 오류는 둘 다 json.JSONDecodeError 계열이라 except 절은 그대로 동작
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
 
 # ============================================================
 # ChatGPT Codex Backend API
 # ============================================================
 CHATGPT_API_URL = 'https://chatgpt.com/backend-api/codex/responses'
 
+# 모든 호출이 같은 호스트로 가므로 keep-alive 세션을 공유해 TCP/TLS 핸드셰이크 재사용
+# (재시도는 call_gpt 가 직접 처리하므로 어댑터 재시도는 끔)
+_SESSION = http_requests.Session()
+_SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=0))
+
+# 호출마다 변하지 않는 헤더
+_STATIC_HEADERS = {
+    'Content-Type': 'application/json',
+    'version': '0.101.0',
+    'user-agent': 'codex_cli_rs/0.101.0',
+    'originator': 'codex_cli_rs',
+}
+
+# 요청 ID 용 난수 (고유성만 필요하므로 호출마다 os.urandom 을 읽는 uuid4 대신 시작 시 1회 시드)
+_ID_RNG = random.Random()
+
+
+def _new_request_id():
+    """UUID4 형식의 요청 ID"""
+    return str(uuid.UUID(int=_ID_RNG.getrandbits(128), version=4))
+
 
 def _build_headers(stream=True):
     """ChatGPT Codex 백엔드 API용 헤더"""
@@ -24,64 +66,88 @@ def _build_headers(stream=True):
     if not token:
         raise RuntimeError('ChatGPT 로그인이 필요합니다. 먼저 로그인해주세요.')
 
-    cache_id = str(uuid.uuid4())
-    headers = {
-        'Authorization': f'Bearer {token}',
-        'Content-Type': 'application/json',
-        'Accept': 'text/event-stream' if stream else 'application/json',
-        'version': '0.101.0',
-        'user-agent': 'codex_cli_rs/0.101.0',
-        'originator': 'codex_cli_rs',
-        'Conversation_id': cache_id,
-        'Session_id': cache_id,
-    }
+    cache_id = _new_request_id()
+    headers = dict(_STATIC_HEADERS)
+    headers['Authorization'] = f'Bearer {token}'
+    headers['Accept'] = 'text/event-stream' if stream else 'application/json'
+    headers['Conversation_id'] = cache_id
+    headers['Session_id'] = cache_id
     account_id = extract_account_id(token)
     if account_id:
         headers['chatgpt-account-id'] = account_id
     return headers
 
 
-def _parse_sse_text(resp):
-    """SSE 스트림에서 최종 텍스트 추출 (response.completed 또는 delta 누적)"""
-    full_text = ''
-    for raw_line in resp.iter_lines():
-        # iter_lines()는 bytes를 반환할 수 있으므로 항상 str로 변환
-        if isinstance(raw_line, bytes):
-            line = raw_line.decode('utf-8', errors='replace')
-        else:
-            line = raw_line
-        if not line or not line.startswith('data: '):
+def _iter_sse_events(resp, markers):
+    """
+    SSE 스트림의 data 프레임 중 markers(이벤트 타입 bytes) 를 포함한 것만 JSON 파싱해 순서대로 반환
+    관심 없는 프레임은 디코딩·파싱하지 않고 건너뜀, [DONE] 에서 종료
+    """
+    # bytes 그대로 처리 (JSON 파서가 UTF-8 bytes 를 직접 받음)
+    for line in resp.iter_lines(chunk_size=_SSE_CHUNK_SIZE):
+        if not line.startswith(b'data: '):
             continue
         payload = line[6:].strip()
-        if payload == '[DONE]':
-            break
+        if payload == b'[DONE]':
+            return
+        if not any(marker in payload for marker in markers):
+            continue
         try:
-            event = json.loads(payload)
-            event_type = event.get('type', '')
+            yield _json_loads(payload)
+        except ValueError:  # JSONDecodeError, 잘못된 UTF-8
+            continue
 
-            # response.completed → 최종 응답에서 텍스트 추출
-            if event_type == 'response.completed':
-                response_obj = event.get('response', event)
-                text = _extract_text_from_response(response_obj)
-                if text:
-                    return text.strip()
 
-            # output_text.delta → 점진적 텍스트 수집
-            elif event_type == 'output_text.delta':
-                full_text += event.get('delta', '')
+# 처리하는 이벤트 타입 (따옴표 포함 - 부분 일치 방지)
+_SSE_TEXT_EVENT_MARKERS = (b'"response.completed"', b'"output_text.delta"', b'"response.output_text.done"')
+_SSE_COMPLETED_MARKERS = (b'"response.completed"',)
+# 소켓 읽기 단위 (기본 512바이트는 긴 응답에서 읽기 호출이 너무 잦음)
+_SSE_CHUNK_SIZE = 16 * 1024
 
-            # response.output_text.done → 한 output_text 블록 완료
-            elif event_type == 'response.output_text.done':
-                t = event.get('text', '')
-                if t:
-                    full_text = t  # 최종 완성본으로 교체
 
-        except json.JSONDecodeError:
-            continue
+def _parse_sse_text(resp):
+    """SSE 스트림에서 최종 텍스트 추출 (response.completed 또는 delta 누적)"""
+    chunks = []  # delta 조각 - 끝에서 한 번만 join
+    for event in _iter_sse_events(resp, _SSE_TEXT_EVENT_MARKERS):
+        event_type = event.get('type', '')
+
+        # response.completed → 최종 응답에서 텍스트 추출
+        if event_type == 'response.completed':
+            response_obj = event.get('response', event)
+            text = _extract_text_from_response(response_obj)
+            if text:
+                return text.strip()
+
+        # output_text.delta → 점진적 텍스트 수집
+        elif event_type == 'output_text.delta':
+            chunks.append(event.get('delta', ''))
 
+        # response.output_text.done → 한 output_text 블록 완료
+        elif event_type == 'response.output_text.done':
+            t = event.get('text', '')
+            if t:
+                chunks = [t]  # 최종 완성본으로 교체
+
+    full_text = ''.join(chunks)
     return full_text.strip() if full_text else None
 
 
+def _parse_sse_image(resp):
+    """SSE 스트림의 response.completed 에서 이미지 URL(또는 결과) 추출"""
+    for event in _iter_sse_events(resp, _SSE_COMPLETED_MARKERS):
+        if event.get('type') == 'response.completed':
+            response_obj = event.get('response', event)
+            for item in response_obj.get('output', []):
+                content = item.get('content', [])
+                if isinstance(content, list):
+                    for c in content:
+                        if c.get('type') == 'image':
+                            return c.get('url') or c.get('image_url')
+                if item.get('type') == 'image_generation_call':
+                    return item.get('result')
+    return None
+
+
 def _extract_text_from_response(data):
     """Responses API 응답 객체에서 텍스트 추출"""
     # output_text 직접 필드
@@ -107,15 +173,86 @@ def _extract_text_from_response(data):
 # ============================================================
 # 핵심 API 호출 함수 (항상 stream=true)
 # ============================================================
-def call_gpt(client_unused, model, system_prompt, user_prompt, temperature=0.7, max_tokens=4096):
+# Codex 백엔드는 stream=false 요청을 거부하므로 JSON 만 필요한 1·2·4단계도 SSE 로 받음
+# (delta 프레임은 _iter_sse_events 의 마커 필터에서 파싱 없이 건너뛰고 done/completed 만 디코딩)
+# 재시도 대기: 지수 백오프 + 지터 (동시 챕터 요청이 같은 순간에 몰려 재시도하지 않도록)
+_BACKOFF_BASE = 1.0
+_BACKOFF_MAX = 30.0
+# 일시적인 오류로 보고 재시도할 상태 코드 (401 은 토큰 갱신 후 재시도로 따로 처리)
+_RETRYABLE_STATUS = frozenset({408, 409, 425, 429, 500, 502, 503, 504})
+
+
+def _retry_delay(attempt, resp=None):
+    delay = min(_BACKOFF_MAX, _BACKOFF_BASE * 2 ** attempt) * (0.5 + random.random())
+    # 429/503 의 Retry-After(초) 가 있으면 그보다 먼저 재시도하지 않음
+    if resp is not None and resp.status_code in (429, 503):
+        retry_after = resp.headers.get('Retry-After', '')
+        if retry_after.isdigit():
+            delay = max(delay, min(int(retry_after), _BACKOFF_MAX))
+    return delay
+
+
+def _prompt_cache_key(cfg, step):
+    """전자책 1권 단위 prompt_cache_key (같은 책·같은 단계 요청끼리 서버 프롬프트 캐시 공유)"""
+    base = cfg.get('_prompt_cache_key') if cfg else None
+    return f'{base}:{step}' if base else _new_request_id()
+
+
+# 응답 디스크 캐시 (개발·재시도용) - STATMRG_CACHE 에 디렉터리를 지정했을 때만 사용
+# 같은 주제를 다시 생성해 다른 결과를 받는 것이 기본 동작이므로 평소에는 꺼 둠
+_RESPONSE_CACHE_DIR = os.environ.get('STATMRG_CACHE') or None
+
+
+def _response_cache_path(model, system_prompt, user_prompt, temperature, max_tokens):
+    if not _RESPONSE_CACHE_DIR:
+        return None
+    key = hashlib.blake2b(
+        f'{model}\x00{system_prompt}\x00{user_prompt}\x00{temperature}\x00{max_tokens}'.encode('utf-8'),
+        digest_size=16,
+    ).hexdigest()
+    return os.path.join(os.path.expanduser(_RESPONSE_CACHE_DIR), f'{key}.txt')
+
+
+def _load_cached_response(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read() or None
+    except OSError:
+        return None
+
+
+def _store_cached_response(path, text):
+    """임시 파일에 쓴 뒤 os.replace 로 교체 (같은 키를 동시에 써도 깨진 파일이 남지 않음)"""
+    tmp_path = f'{path}.{_ID_RNG.getrandbits(64):016x}.tmp'
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        log.warning('[캐시] 응답 캐시 저장 실패: %s', e)
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def call_gpt(client_unused, model, system_prompt, user_prompt, temperature=0.7, max_tokens=4096,
+             cache_key=None, no_cache=False):
     """ChatGPT Codex 백엔드 API 호출 (SSE stream, 재시도 포함)"""
 
+    cache_path = _response_cache_path(model, system_prompt, user_prompt, temperature, max_tokens)
+    if cache_path and not no_cache:
+        cached = _load_cached_response(cache_path)
+        if cached:
+            return cached
+
     body = {
         'model': model,
         'instructions': system_prompt,
         'stream': True,
         'store': False,
-        'prompt_cache_key': str(uuid.uuid4()),
+        'prompt_cache_key': cache_key or _new_request_id(),
         'input': [
             {'type': 'message', 'role': 'user', 'content': user_prompt},
         ],
@@ -124,135 +261,133 @@ def call_gpt(client_unused, model, system_prompt, user_prompt, temperature=0.7,
     for attempt in range(3):
         try:
             headers = _build_headers(stream=True)
-            resp = http_requests.post(
+            # with 블록을 벗어나면 응답을 닫아 연결을 세션 풀로 반환
+            with _SESSION.post(
                 CHATGPT_API_URL,
                 headers=headers,
                 json=body,
                 timeout=300,
                 stream=True,
-            )
-
-            if resp.status_code == 401:
-                if attempt < 2:
-                    time.sleep(2)
-                    continue
-                raise RuntimeError(f'인증 실패 (401): {resp.text[:300]}')
+            ) as resp:
+                if resp.status_code == 401:
+                    if attempt < 2:
+                        time.sleep(_retry_delay(attempt))
+                        continue
+                    raise RuntimeError(f'인증 실패 (401): {resp.text[:300]}')
+
+                if resp.status_code != 200:
+                    error_text = ''
+                    try:
+                        error_text = resp.text[:500]
+                    except Exception:
+                        error_text = f'status {resp.status_code}'
+                    # 요청 자체가 잘못된 4xx 등은 다시 보내도 실패하므로 바로 오류 처리
+                    if attempt < 2 and resp.status_code in _RETRYABLE_STATUS:
+                        time.sleep(_retry_delay(attempt, resp))
+                        continue
+                    raise RuntimeError(f'API 오류 ({resp.status_code}): {error_text}')
+
+                text = _parse_sse_text(resp)
+                if text:
+                    if cache_path:
+                        _store_cached_response(cache_path, text)
+                    return text
 
-            if resp.status_code != 200:
-                error_text = ''
-                try:
-                    error_text = resp.text[:500]
-                except Exception:
-                    error_text = f'status {resp.status_code}'
                 if attempt < 2:
-                    time.sleep(3)
+                    time.sleep(_retry_delay(attempt))
                     continue
-                raise RuntimeError(f'API 오류 ({resp.status_code}): {error_text}')
-
-            text = _parse_sse_text(resp)
-            if text:
-                return text
-
-            if attempt < 2:
-                time.sleep(2)
-                continue
-            raise RuntimeError('응답에서 텍스트를 추출할 수 없습니다.')
+                raise RuntimeError('응답에서 텍스트를 추출할 수 없습니다.')
 
         except http_requests.exceptions.Timeout:
             if attempt < 2:
-                time.sleep(3)
+                time.sleep(_retry_delay(attempt))
                 continue
             raise RuntimeError('API 요청 시간 초과 (300초)')
         except RuntimeError:
             raise
-        except Exception as e:
+        except (http_requests.exceptions.ConnectionError, http_requests.exceptions.ChunkedEncodingError) as e:
             if attempt < 2:
-                time.sleep(2)
+                time.sleep(_retry_delay(attempt))
                 continue
             raise e
 
     raise RuntimeError('API 호출 실패 (최대 재시도 초과)')
 
 
-def call_gpt_json(client, model, system_prompt, user_prompt, temperature=0.7, max_tokens=4096):
+_JSON_BODY_RE = re.compile(r'[\[{][\s\S]*[\]}]')
+_CODE_FENCE_RE = re.compile(r'^```(?:json)?\s*|\s*```$')
+
+
+def call_gpt_json(client, model, system_prompt, user_prompt, temperature=0.7, max_tokens=4096,
+                  cache_key=None, no_cache=False):
     """GPT API 호출 → JSON 파싱"""
-    raw = call_gpt(client, model, system_prompt, user_prompt, temperature, max_tokens)
-    # ```json ... ``` 블록 제거
-    cleaned = raw
-    if cleaned.startswith('```'):
-        cleaned = cleaned.split('\n', 1)[-1] if '\n' in cleaned else cleaned[3:]
-    if cleaned.endswith('```'):
-        cleaned = cleaned[:-3]
-    cleaned = cleaned.strip()
-    if cleaned.startswith('```json'):
-        cleaned = cleaned[7:]
-    if cleaned.startswith('```'):
-        cleaned = cleaned[3:]
-    cleaned = cleaned.strip()
-
-    # JSON 객체/배열 추출
-    match = re.search(r'[\[{][\s\S]*[\]}]', cleaned)
+    raw = call_gpt(client, model, system_prompt, user_prompt, temperature, max_tokens,
+                   cache_key=cache_key, no_cache=no_cache)
+    # 첫 [ 또는 { 부터 마지막 ] 또는 } 까지가 JSON 본문 (```json 코드 블록 감싸기도 자연히 제외)
+    match = _JSON_BODY_RE.search(raw)
     if match:
-        cleaned = match.group(0)
-
-    return json.loads(cleaned)
+        return _json_loads(match.group(0))
+    # 괄호가 없으면 코드 블록 표시만 제거하고 그대로 파싱
+    return _json_loads(_CODE_FENCE_RE.sub('', raw.strip()))
 
 
 # ============================================================
 # 1단계: 유료 가치 판단
 # ============================================================
-def step1_value_analysis(client, model, topic, config=None):
-    cfg = config or {}
-    system = cfg.get('prompt_value_system') or """당신은 전자책 시장 분석 전문가입니다.
-반드시 아래 JSON 형식으로만 응답하세요. 다른 텍스트 없이 순수 JSON만 출력하세요."""
-
-    user = f"""다음 주제/키워드에 대해 분석하세요: "{topic}"
+# 사용자 프롬프트 고정 골격 — 호출마다 f-string 을 다시 조립하지 않도록 import 시 1회 생성
+_STEP1_USER_TMPL = """다음 주제/키워드에 대해 분석하세요: "%s"
 
 JSON 형식:
-{{
+{
   "topic_refined": "정제된 주제 (구체적이고 판매 가능한 형태로)",
-  "free_vs_paid": {{
+  "free_vs_paid": {
     "free_consumption_risk": "무료로 소비될 확률과 그 이유 (솔직하게)",
     "paid_conversion_points": ["유료 전환 가능 포인트 1", "포인트 2", "포인트 3"],
     "verdict": "유료 가치 판단 결론 (1~2문장)"
-  }},
-  "problem_solved": {{
+  },
+  "problem_solved": {
     "time": "이 전자책이 독자의 시간을 얼마나 줄여주는지 (구체적 수치/상황)",
     "money": "독자의 돈을 얼마나 아껴주는지 (구체적 수치/상황)",
     "emotion": "독자의 어떤 감정적 고통을 해결해주는지"
-  }},
+  },
   "why_pay": "왜 돈 주고 사야 하는지 (구조적 설명, 2~3문장)",
   "target_reader": "이 책을 살 사람의 구체적 프로필 (1~2문장)",
   "time_saved_hours": "이 책이 절약해주는 시간 (숫자, 시간 단위)",
   "money_saved_won": "이 책이 절약해주는 비용 (숫자, 원 단위)",
   "mistakes_prevented": "이 책이 방지해주는 실수 (숫자)개"
-}}"""
+}"""
+
 
-    return call_gpt_json(client, model, system, user, temperature=0.6, max_tokens=2000)
+def step1_value_analysis(client, model, topic, config=None):
+    cfg = config or {}
+    system = cfg.get('prompt_value_system') or _DEFAULT_PROMPT_VALUE_SYSTEM
+
+    user = _STEP1_USER_TMPL % topic
+
+    return call_gpt_json(client, model, system, user, temperature=0.6, max_tokens=2000,
+                         cache_key=_prompt_cache_key(cfg, 'analysis'))
 
 
 # ============================================================
 # 2단계: 독자 심리 분석 + 목차 설계
 # ============================================================
-def step2_toc_design(client, model, topic, analysis, config=None):
-    cfg = config or {}
-    system = """당신은 베스트셀러 전자책 기획 전문가입니다.
+_STEP2_SYSTEM = """당신은 베스트셀러 전자책 기획 전문가입니다.
 구매자 관점에서 목차를 설계합니다. 반드시 JSON 형식으로만 응답하세요."""
 
-    user = f"""주제: "{topic}"
-분석 결과: {json.dumps(analysis, ensure_ascii=False)}
+_STEP2_USER_TMPL = """주제: "%s"
+분석 결과: %s
 
 아래 JSON 형식으로 응답하세요:
-{{
+{
   "book_title": "전자책 제목 (구매 욕구를 자극하는, 30자 내외)",
   "subtitle": "부제목 (구체적 결과를 약속하는)",
-  "reader_psychology": {{
+  "reader_psychology": {
     "concerns": ["구매 전 고민 1", "고민 2", "고민 3"],
     "expectations": ["기대 1", "기대 2", "기대 3"],
     "fears": ["두려움 1", "두려움 2", "두려움 3"]
-  }},
+  },
   "chapters": [
-    {{
+    {
       "phase": "문제인식",
       "chapter_num": 1,
       "title": "안 사면 손해라고 느끼게 하는 챕터 제목",
@@ -260,26 +395,36 @@ def step2_toc_design(client, model, topic, analysis, config=None):
       "before_state": "읽기 전 독자 상태",
       "after_state": "읽고 난 후 독자 상태",
       "sections": ["소제목1", "소제목2", "소제목3"]
-    }}
+    }
   ]
-}}
+}
+
+목표 페이지 수: %s~%s페이지
 
-목표 페이지 수: {cfg.get('target_pages_min', 100)}~{cfg.get('target_pages_max', 150)}페이지
+%s"""
 
-{cfg.get('prompt_toc_rules') or '''목차 설계 규칙:
-1. 총 12~16개 챕터 (반드시 12개 이상)
-2. 4단계 구조: 문제인식(3~4장) → 방법발견(3~4장) → 실행(4~5장) → 확신(2~3장)
-3. 각 챕터 제목은 "이건 안 사면 손해다"라고 느끼게 하는 문장
-4. 각 챕터마다 반드시 5~7개 소제목(sections) - 소제목이 적으면 분량 부족
-5. 설명용 문장이 아닌, 결과가 보이는 실행 중심 제목'''}"""
 
-    return call_gpt_json(client, model, system, user, temperature=0.7, max_tokens=4000)
+def step2_toc_design(client, model, topic, analysis, config=None, analysis_json=None):
+    cfg = config or {}
+    system = _STEP2_SYSTEM
+
+    if analysis_json is None:
+        analysis_json = json.dumps(analysis, ensure_ascii=False)
+    user = _STEP2_USER_TMPL % (
+        topic, analysis_json,
+        cfg.get('target_pages_min', 100), cfg.get('target_pages_max', 150),
+        cfg.get('prompt_toc_rules') or _DEFAULT_PROMPT_TOC_RULES,
+    )
+
+    return call_gpt_json(client, model, system, user, temperature=0.7, max_tokens=4000,
+                         cache_key=_prompt_cache_key(cfg, 'toc'))
 
 
 # ============================================================
 # 3단계: 챕터별 본문 작성
 # ============================================================
-def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, total_chapters, config=None, reference_text=''):
+def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, total_chapters, config=None, reference_text='',
+                        executor=None):
     """챕터를 2회 호출(전반부/후반부)로 나눠 풍부한 분량 확보"""
     cfg = config or {}
     sections = chapter.get('sections', [])
@@ -299,18 +444,7 @@ def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, t
     sections_per_half = max(1, len(sections_first))
     min_chars_per_half = max(3000, chars_per_chapter // 2)
 
-    system = cfg.get('prompt_chapter_system') or """당신은 전자책 집필 전문가입니다. 사람이 실제로 돈을 내고 살 가치가 있는 상품 수준의 글을 작성합니다.
-
-글쓰기 원칙:
-- 지식을 그냥 설명하지 말고, 결과가 보이게 정리
-- 읽기 전 상태와 읽고 난 후 상태가 명확히 대비되게
-- 설명용 문장은 줄이고 "그래서 뭘 하면 되는지" 실행 단위로 구성
-- 한 문단은 3~5줄, 문단 사이 적절한 여백
-- 독자가 바로 실행할 수 있는 구체적 행동 지침 포함
-- 기계적 나열이 아닌 이야기하듯 자연스러운 흐름
-- 실제 사례, 구체적 숫자, 비교 예시를 풍부하게 활용
-- 독자가 "이건 내 이야기다"라고 느낄 수 있게 공감 포인트 배치
-- 핵심 개념은 반복적으로 다른 표현으로 강조"""
+    system = cfg.get('prompt_chapter_system') or _DEFAULT_PROMPT_CHAPTER_SYSTEM
 
     # 참고 자료를 챕터별로 할당 (긴 참고 자료를 챕터 수로 나눠 균등 배분)
     ref_section = ''
@@ -346,8 +480,6 @@ def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, t
 7. 반드시 한국어로 작성
 8. 최소 {min_chars_per_half}자 이상 작성"""
 
-    part1 = call_gpt(client, model, system, user1, temperature=0.7, max_tokens=8000)
-
     # 2차: 후반부 소제목 + 요약 + 체크리스트
     user2 = f"""전자책: "{book_info.get('book_title', topic)}"
 현재 챕터: {chapter_idx + 1}/{total_chapters}
@@ -373,7 +505,28 @@ def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, t
 7. 반드시 한국어로 작성
 8. 최소 {min_chars_per_half}자 이상 작성"""
 
-    part2 = call_gpt(client, model, system, user2, temperature=0.7, max_tokens=8000)
+    # 후반부 프롬프트는 전반부 결과를 쓰지 않으므로 두 요청을 동시에 보냄
+    # (후반부는 별도 스레드, 전반부는 현재 스레드에서 실행)
+    cache_key = _prompt_cache_key(cfg, 'chapter')
+    call_second = partial(call_gpt, client, model, system, user2, temperature=0.7, max_tokens=8000,
+                          cache_key=cache_key)
+    own_executor = None
+    if executor is None:
+        own_executor = executor = ThreadPoolExecutor(max_workers=1)
+    try:
+        future2 = executor.submit(call_second)
+        try:
+            part1 = call_gpt(client, model, system, user1, temperature=0.7, max_tokens=8000, cache_key=cache_key)
+        except BaseException:
+            # 전반부가 실패하면 챕터 전체가 실패이므로 후반부는 필요 없음
+            # (대기 중이면 취소, 이미 실행 중이면 결과를 기다리지 않고 바로 오류 전달)
+            future2.cancel()
+            raise
+        # 공유 풀이 가득 차 후반부가 아직 대기 중이면 취소하고 현재 스레드에서 직접 실행 (교착 방지)
+        part2 = call_second() if future2.cancel() else future2.result()
+    finally:
+        if own_executor is not None:
+            own_executor.shutdown(wait=False, cancel_futures=True)
 
     return part1 + '\n\n' + part2
 
@@ -381,37 +534,43 @@ def step3_write_chapter(client, model, topic, book_info, chapter, chapter_idx, t
 # ============================================================
 # 4단계: 자연 유통 분석 + 판매 소개문
 # ============================================================
-def step4_marketing(client, model, topic, analysis, book_info, config=None):
-    cfg = config or {}
-    system = cfg.get('prompt_marketing_system') or """당신은 전자책 마케팅 전략 전문가입니다. 반드시 JSON 형식으로만 응답하세요."""
-
-    user = f"""전자책: "{book_info.get('book_title', topic)}"
-분석: {json.dumps(analysis, ensure_ascii=False)}
+_STEP4_USER_TMPL = """전자책: "%s"
+분석: %s
 
 JSON 형식으로 응답:
-{{
-  "natural_distribution": {{
+{
+  "natural_distribution": {
     "blog_questions": ["블로그에서 이 주제 관련 자주 올라오는 질문 1", "질문 2", "질문 3"],
     "community_complaints": ["커뮤니티 불만/후기 형태 1", "형태 2", "형태 3"],
     "sns_consumption": ["SNS에서 소비되는 형태 1", "형태 2", "형태 3"]
-  }},
+  },
   "content_topics": [
-    {{
+    {
       "topic": "관련 콘텐츠 주제",
       "hook_sentence": "이 콘텐츠에서 전자책을 자연스럽게 연결하는 문장 예시"
-    }}
+    }
   ],
   "sales_copy": "이 전자책이 왜 광고 없이도 팔릴 수 있는지 한 문단 (논리적, 담백하게, 구조 중심, 감정적 표현 배제. 상세페이지/소개글/SNS 고정글에 그대로 사용 가능하게)",
-  "value_summary": {{
+  "value_summary": {
     "time_saved": "절약 시간 요약",
     "money_saved": "절약 비용 요약",
     "mistakes_prevented": "방지 실수 요약"
-  }}
-}}
+  }
+}
 
 content_topics는 정확히 5개를 만드세요."""
 
-    return call_gpt_json(client, model, system, user, temperature=0.7, max_tokens=3000)
+
+def step4_marketing(client, model, topic, analysis, book_info, config=None, analysis_json=None):
+    cfg = config or {}
+    system = cfg.get('prompt_marketing_system') or _DEFAULT_PROMPT_MARKETING_SYSTEM
+
+    if analysis_json is None:
+        analysis_json = json.dumps(analysis, ensure_ascii=False)
+    user = _STEP4_USER_TMPL % (book_info.get('book_title', topic), analysis_json)
+
+    return call_gpt_json(client, model, system, user, temperature=0.7, max_tokens=3000,
+                         cache_key=_prompt_cache_key(cfg, 'marketing'))
 
 
 # ============================================================
@@ -437,7 +596,8 @@ def step_prologue(client, model, topic, book_info, reference_text='', config=Non
 4. 저자가 독자에게 보내는 격려 메시지 (100~200자)
 
 총 800~1200자. 따뜻하고 진정성 있는 1인칭 어조로 작성하세요."""
-    return call_gpt(client, model, system, user, temperature=0.7, max_tokens=2000)
+    return call_gpt(client, model, system, user, temperature=0.7, max_tokens=2000,
+                    cache_key=_prompt_cache_key(config, 'prologue'))
 
 
 # ============================================================
@@ -463,13 +623,14 @@ def step_epilogue(client, model, topic, book_info, chapters_content, reference_t
 5. 마지막 인사말 (100자 내외)
 
 총 1000~1400자. 독자의 행동을 이끌어내는 진정성 있는 어조로 작성하세요."""
-    return call_gpt(client, model, system, user, temperature=0.7, max_tokens=2500)
+    return call_gpt(client, model, system, user, temperature=0.7, max_tokens=2500,
+                    cache_key=_prompt_cache_key(config, 'epilogue'))
 
 
 # ============================================================
 # 5단계: 책 표지 이미지 생성 (이미지는 선택사항, 실패해도 계속 진행)
 # ============================================================
-def step5_generate_cover(client_unused, book_title, subtitle):
+def step5_generate_cover(client_unused, book_title, subtitle, cache_key=None):
     """전자책 표지 생성 - Codex API는 이미지 생성을 직접 지원하지 않을 수 있으므로 실패 허용"""
     try:
         headers = _build_headers(stream=True)
@@ -480,55 +641,33 @@ def step5_generate_cover(client_unused, book_title, subtitle):
             'instructions': '이미지 생성 요청을 처리해주세요.',
             'stream': True,
             'store': False,
-            'prompt_cache_key': str(uuid.uuid4()),
+            'prompt_cache_key': cache_key or _new_request_id(),
             'input': [
                 {'type': 'message', 'role': 'user', 'content': prompt},
             ],
         }
 
-        resp = http_requests.post(CHATGPT_API_URL, headers=headers, json=body, timeout=120, stream=True)
-        if resp.status_code != 200:
-            print(f"[Cover] 표지 생성 실패: status={resp.status_code}")
-            return None
-
-        # SSE에서 이미지 URL 찾기
-        for raw_line in resp.iter_lines():
-            if isinstance(raw_line, bytes):
-                line = raw_line.decode('utf-8', errors='replace')
-            else:
-                line = raw_line
-            if not line or not line.startswith('data: '):
-                continue
-            payload = line[6:].strip()
-            if payload == '[DONE]':
-                break
-            try:
-                event = json.loads(payload)
-                # 이미지 관련 이벤트 탐색
-                if event.get('type') == 'response.completed':
-                    response_obj = event.get('response', event)
-                    for item in response_obj.get('output', []):
-                        content = item.get('content', [])
-                        if isinstance(content, list):
-                            for c in content:
-                                if c.get('type') == 'image':
-                                    return c.get('url') or c.get('image_url')
-                        if item.get('type') == 'image_generation_call':
-                            return item.get('result')
-            except json.JSONDecodeError:
-                continue
+        with _SESSION.post(CHATGPT_API_URL, headers=headers, json=body, timeout=120, stream=True) as resp:
+            if resp.status_code != 200:
+                log.warning('[Cover] 표지 생성 실패: status=%s', resp.status_code)
+                return None
 
-        print("[Cover] 표지 이미지를 응답에서 찾을 수 없음")
+            # SSE에서 이미지 URL 찾기
+            url = _parse_sse_image(resp)
+            if url:
+                return url
+
+        log.warning('[Cover] 표지 이미지를 응답에서 찾을 수 없음')
         return None
     except Exception as e:
-        print(f"[Cover] 표지 생성 실패: {e}")
+        log.warning('[Cover] 표지 생성 실패: %s', e)
         return None
 
 
 # ============================================================
 # 6단계: 챕터 삽입 이미지 생성
 # ============================================================
-def generate_chapter_image(client_unused, chapter_title, chapter_purpose):
+def generate_chapter_image(client_unused, chapter_title, chapter_purpose, cache_key=None):
     """챕터 이미지 생성 - 실패해도 계속 진행"""
     try:
         headers = _build_headers(stream=True)
@@ -539,50 +678,64 @@ def generate_chapter_image(client_unused, chapter_title, chapter_purpose):
             'instructions': '이미지 생성 요청을 처리해주세요.',
             'stream': True,
             'store': False,
-            'prompt_cache_key': str(uuid.uuid4()),
+            'prompt_cache_key': cache_key or _new_request_id(),
             'input': [
                 {'type': 'message', 'role': 'user', 'content': prompt},
             ],
         }
 
-        resp = http_requests.post(CHATGPT_API_URL, headers=headers, json=body, timeout=120, stream=True)
-        if resp.status_code != 200:
-            return None
-
-        for raw_line in resp.iter_lines():
-            if isinstance(raw_line, bytes):
-                line = raw_line.decode('utf-8', errors='replace')
-            else:
-                line = raw_line
-            if not line or not line.startswith('data: '):
-                continue
-            payload = line[6:].strip()
-            if payload == '[DONE]':
-                break
-            try:
-                event = json.loads(payload)
-                if event.get('type') == 'response.completed':
-                    response_obj = event.get('response', event)
-                    for item in response_obj.get('output', []):
-                        content = item.get('content', [])
-                        if isinstance(content, list):
-                            for c in content:
-                                if c.get('type') == 'image':
-                                    return c.get('url') or c.get('image_url')
-                        if item.get('type') == 'image_generation_call':
-                            return item.get('result')
-            except json.JSONDecodeError:
-                continue
-
-        return None
+        with _SESSION.post(CHATGPT_API_URL, headers=headers, json=body, timeout=120, stream=True) as resp:
+            if resp.status_code != 200:
+                return None
+            return _parse_sse_image(resp)
     except Exception as e:
-        print(f"[Image] 챕터 이미지 생성 실패: {e}")
+        log.warning('[Image] 챕터 이미지 생성 실패: %s', e)
         return None
 
 
 # ============================================================
 # 전체 파이프라인 실행
 # ============================================================
+def _run_concurrent(tasks, max_workers, on_done=None, executor=None):
+    """
+    인자 없는 호출 목록을 스레드 풀에서 최대 max_workers 개씩 동시에 실행하고 입력 순서대로 결과 반환
+    executor 를 넘기면 그 풀을 공유하고, 없으면 임시 풀을 만들어 씀
+    on_done(index, result) 는 완료 순서대로 호출 스레드에서 실행 (진행 콜백용)
+    하나라도 실패하면 대기 중인 작업을 취소하고 예외 전파
+    """
+    results = [None] * len(tasks)
+    if not tasks:
+        return results
+    max_workers = max(1, min(max_workers, len(tasks)))
+    own_executor = executor is None
+    if own_executor:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    pending = iter(enumerate(tasks))
+    running = {}
+
+    def submit(count):
+        for i, task in islice(pending, count):
+            running[executor.submit(task)] = i
+
+    try:
+        # 공유 풀에서도 동시 실행 수가 max_workers 를 넘지 않도록 하나 끝날 때마다 하나씩 투입
+        submit(max_workers)
+        while running:
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = running.pop(fut)
+                results[i] = fut.result()
+                if on_done:
+                    on_done(i, results[i])
+            submit(len(done))
+    finally:
+        for fut in running:
+            fut.cancel()
+        if own_executor:
+            executor.shutdown(wait=False, cancel_futures=True)
+    return results
+
+
 def generate_ebook(model, topic, include_images=True, progress_callback=None, api_key=None,
                    config=None, reference_materials=None):
     """
@@ -617,21 +770,31 @@ def generate_ebook(model, topic, include_images=True, progress_callback=None, ap
         if progress_callback:
             progress_callback(current_step, total_steps, msg, data)
 
-    cfg = config or {}
+    # 한 권의 모든 요청이 같은 prompt_cache_key 계열을 쓰도록 실행마다 키를 하나 발급
+    # (호출자의 config 는 건드리지 않도록 복사본에 기록)
+    cfg = dict(config or {})
+    cfg['_prompt_cache_key'] = _new_request_id()
 
     # 참고 자료 안내를 topic에 포함 (가치 분석·목차 설계에 사용)
     full_topic = topic
     if ref_text:
         full_topic = f'{topic}\n\n[참고 자료 있음: 아래 모든 참고 자료를 꼼꼼히 읽고 핵심 내용을 빠뜨리지 말고 적극 반영하세요]\n{ref_text[:6000]}'
 
+    # 챕터·챕터 후반부·이미지 요청이 함께 쓰는 스레드 풀 (챕터 동시 수 × 전반/후반 2개)
+    concurrency = max(1, cfg.get('chapter_concurrency', 4))
+    executor = ThreadPoolExecutor(max_workers=concurrency * 2, thread_name_prefix='ebook')
+
     try:
         # 1단계: 유료 가치 판단
         progress('주제 분석 및 유료 가치 판단 중...')
         result['analysis'] = step1_value_analysis(client, model, full_topic, cfg)
+        # 2·6단계 프롬프트에 같은 분석 결과가 들어가므로 직렬화는 한 번만
+        analysis_json = json.dumps(result['analysis'], ensure_ascii=False)
 
         # 2단계: 목차 설계
         progress('구매자 관점 목차 설계 중...')
-        result['book_info'] = step2_toc_design(client, model, full_topic, result['analysis'], cfg)
+        result['book_info'] = step2_toc_design(client, model, full_topic, result['analysis'], cfg,
+                                               analysis_json=analysis_json)
 
         chapters = result['book_info'].get('chapters', [])
         total_steps = 6 + len(chapters) + (len(chapters) if include_images else 0)
@@ -641,17 +804,25 @@ def generate_ebook(model, topic, include_images=True, progress_callback=None, ap
         try:
             result['prologue'] = step_prologue(client, model, topic, result['book_info'], ref_text, cfg)
         except Exception as e:
-            print(f'[프롤로그] 생성 실패: {e}')
+            log.warning('[프롤로그] 생성 실패: %s', e)
             result['prologue'] = ''
 
-        # 4단계: 챕터별 본문 작성 (참고 자료를 각 챕터에 전달)
-        for i, chapter in enumerate(chapters):
-            progress(f"챕터 {i+1}/{len(chapters)} 집필 중: {chapter.get('title', '')[:30]}...")
-            content = step3_write_chapter(
-                client, model, full_topic, result['book_info'], chapter, i, len(chapters), cfg,
-                reference_text=ref_text,
-            )
-            result['chapters_content'].append({'chapter': chapter, 'content': content})
+        # 4단계: 챕터별 본문 작성 (참고 자료를 각 챕터에 전달, 챕터끼리 독립이므로 동시 실행)
+        done_count = 0
+
+        def on_chapter_done(i, content):
+            nonlocal done_count
+            done_count += 1
+            progress(f"챕터 {done_count}/{len(chapters)} 집필 완료: {chapters[i].get('title', '')[:30]}")
+
+        contents = _run_concurrent([
+            partial(step3_write_chapter, client, model, full_topic, result['book_info'], chapter, i,
+                    len(chapters), cfg, reference_text=ref_text, executor=executor)
+            for i, chapter in enumerate(chapters)
+        ], concurrency, on_chapter_done, executor)
+        result['chapters_content'] = [
+            {'chapter': chapter, 'content': content} for chapter, content in zip(chapters, contents)
+        ]
 
         # 5단계: 에필로그 생성
         progress('에필로그 작성 중...')
@@ -660,34 +831,42 @@ def generate_ebook(model, topic, include_images=True, progress_callback=None, ap
                 client, model, topic, result['book_info'], result['chapters_content'], ref_text, cfg
             )
         except Exception as e:
-            print(f'[에필로그] 생성 실패: {e}')
+            log.warning('[에필로그] 생성 실패: %s', e)
             result['epilogue'] = ''
 
         # 6단계: 마케팅 분석
         progress('자연 유통 분석 및 판매 소개문 작성 중...')
-        result['marketing'] = step4_marketing(client, model, topic, result['analysis'], result['book_info'], cfg)
+        result['marketing'] = step4_marketing(client, model, topic, result['analysis'], result['book_info'], cfg,
+                                              analysis_json=analysis_json)
 
-        # 7단계: 표지 이미지
+        # 7·8단계: 표지 이미지 + 챕터 이미지 (동시 실행)
         if include_images:
-            progress('전자책 표지 이미지 생성 중...')
-            result['cover_url'] = step5_generate_cover(
+            image_tasks = [partial(
+                step5_generate_cover,
                 client,
                 result['book_info'].get('book_title', topic),
                 result['book_info'].get('subtitle', ''),
-            )
-
-            # 8단계: 챕터 이미지
-            for i, ch_data in enumerate(result['chapters_content']):
-                chapter = ch_data['chapter']
-                progress(f"챕터 {i+1} 이미지 생성 중...")
-                img_url = generate_chapter_image(client, chapter.get('title', ''), chapter.get('purpose', ''))
-                result['chapter_images'].append(img_url)
+                cache_key=_prompt_cache_key(cfg, 'cover'),
+            )] + [
+                partial(generate_chapter_image, client, chapter.get('title', ''), chapter.get('purpose', ''),
+                        cache_key=_prompt_cache_key(cfg, 'image'))
+                for chapter in chapters
+            ]
+
+            def on_image_done(i, url):
+                progress('전자책 표지 이미지 생성 완료' if i == 0 else f'챕터 {i} 이미지 생성 완료')
+
+            images = _run_concurrent(image_tasks, concurrency, on_image_done, executor)
+            result['cover_url'] = images[0]
+            result['chapter_images'] = images[1:]
         else:
             progress('이미지 생성 건너뜀')
             result['chapter_images'] = [None] * len(chapters)
 
     except Exception as e:
         result['error'] = str(e)
-        traceback.print_exc()
+        log.exception('[전자책] 생성 실패')
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
 
     return result
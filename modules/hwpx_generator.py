@@ -29,16 +29,50 @@ Namespaces:
 
 import os
 import re
+import time
 import zipfile
-import io
-import xml.sax.saxutils as saxutils
+from functools import lru_cache
 from datetime import datetime, timezone
 from config import load_config
 
 
-def _esc(text):
-    """XML 특수문자 이스케이프"""
-    return saxutils.escape(str(text))
+def _esc_bytes(text):
+    """
+    UTF-8 bytes 로 인코딩 후 XML 이스케이프 (단락은 bytes 로 조립해 그대로 ZIP 에 기록)
+    한글이 섞인 str.translate 는 글자마다 표를 찾으므로, 인코딩된 bytes 에서 replace 로 처리
+    ('&' 를 먼저 바꿔야 이중 이스케이프가 생기지 않음)
+    """
+    data = str(text).encode('utf-8')
+    if b'&' in data:
+        data = data.replace(b'&', b'&amp;')
+    if b'<' in data:
+        data = data.replace(b'<', b'&lt;')
+    if b'>' in data:
+        data = data.replace(b'>', b'&gt;')
+    return data
+
+
+# ─── 본문 줄 패턴 (import 시 한 번만 컴파일) ──────────────────────
+_H2_EQ_RE      = re.compile(r'^={2,}\s*(.+?)\s*={2,}$')   # == 소제목 ==
+_LABEL_RE      = re.compile(r'^\[([^\]]{2,20})\]\s*(.*)')  # [라벨] 텍스트
+_BULLET_RE     = re.compile(r'^[-•●▶►✓]\s+')               # 불릿
+_NUM_RE        = re.compile(r'^(\d+)[.)]\s+(.+)')          # 번호 리스트
+_TAG_RE        = re.compile(r'<[^>]+>')                    # 미리보기용 태그 제거
+_SAFE_TITLE_RE = re.compile(r'[^\w가-힣\s\-]')             # 파일명에 못 쓰는 문자
+# 불릿 줄 첫 글자 (정규식을 돌리기 전에 첫 글자로 먼저 거름)
+_BULLET_CHARS = frozenset('-•●▶►✓')
+
+# generate() 가 읽는 책 데이터 필드와 서식 설정 (app.py 의 HWPX 재사용 판단용 해시에 사용)
+_INPUT_KEYS = ('book_info', 'analysis', 'prologue', 'chapters_content', 'epilogue', 'marketing')
+_STYLE_KEYS = (
+    'pdf_font_size', 'pdf_heading_size', 'pdf_subheading_size', 'pdf_line_spacing',
+    'pdf_margin_left', 'pdf_margin_right', 'pdf_margin_top', 'pdf_margin_bottom',
+)
+
+# 가치 요약(analysis.problem_solved)·마케팅 부록(value_summary) 항목: (표시 이름, 키)
+_PROBLEM_FIELDS = (('절약 시간', 'time'), ('비용 절감', 'money'), ('감정적 해방', 'emotion'))
+_VALUE_FIELDS   = (('절약 시간', 'time_saved'), ('비용 절감', 'money_saved'),
+                   ('방지 실수', 'mistakes_prevented'))
 
 
 # ─── 단위 변환 ────────────────────────────────────────────────────
@@ -48,119 +82,258 @@ def _pt_to_hwp(pt):
     return int(pt * 100)
 
 def _mm_to_hwp(mm):
-    """mm → HWPUNIT  (1mm = 72/25.4 pt)"""
-    return int(mm * 72 / 25.4 * 100)
-
-
-class EbookHwpxGenerator:
+    """mm → HWPUNIT  (1mm = 72/25.4 pt = 36000/127 HWPUNIT, 정수 mm 는 부동소수 오차 없이 계산)"""
+    return int(mm * 36000 // 127)
+
+
+# ─── 섹션 속성 고정값 ─────────────────────────────────────────────
+# 머리말·꼬리말 여백 15mm
+_HEADER_FOOTER_HWP = _mm_to_hwp(15)
+# 쪽 테두리 3종(BOTH/EVEN/ODD) – type 만 다르고 나머지는 같음
+_PAGE_BORDER_FILL_TPL = (
+    '      <hp:pageBorderFill type="%s" borderFillIDRef="0"'
+    ' textBorder="PAPER" headerInside="0" footerInside="0" fillArea="PAPER">\n'
+    '        <hp:offset left="1417" right="1417" top="1417" bottom="1417"/>\n'
+    '      </hp:pageBorderFill>\n'
+)
+_PAGE_BORDER_FILLS = ''.join(_PAGE_BORDER_FILL_TPL % t for t in ('BOTH', 'EVEN', 'ODD'))
+# 섹션 속성 % 템플릿 – 쪽 크기·여백만 호출마다 채움 (머리말·꼬리말 여백과 쪽 테두리는 고정)
+_SECPR_TPL = (
+    '<hp:secPr id="0" textDirection="HORIZONTAL" spaceColumns="1134"'
+    ' tabStop="8000" tabStopVal="4000" tabStopUnit="HWPUNIT"'
+    ' outlineShapeIDRef="0" memoShapeIDRef="0"'
+    ' textVerticalWidthHead="0" masterPageCnt="0">\n'
+    '      <hp:grid lineGrid="0" charGrid="0" wonggojiFormat="0"/>\n'
+    '      <hp:startNum pageStartsOn="BOTH" page="0" pic="0" tbl="0" equation="0"/>\n'
+    '      <hp:visibility hideFirstHeader="0" hideFirstFooter="0"'
+    ' hideFirstMasterPage="0" border="SHOW_ALL" fill="SHOW_ALL"'
+    ' hideFirstPageNum="0" hideFirstEmptyLine="0" showLineNumber="0"/>\n'
+    '      <hp:lineNumberShape restartType="0" countBy="0" distance="0" startNumber="0"/>\n'
+    '      <hp:pagePr landscape="WIDELY" width="%(pw)s" height="%(ph)s" gutterType="LEFT_ONLY">\n'
+    '        <hp:margin header="%(hdr)s" footer="%(ftr)s" gutter="0"'
+    ' left="%(ml)s" right="%(mr)s" top="%(mt)s" bottom="%(mb)s"/>\n'
+    '      </hp:pagePr>\n'
+    '      <hp:footNotePr>\n'
+    '        <hp:autoNumFormat type="DIGIT" userChar="" prefixChar="" suffixChar=")" supscript="0"/>\n'
+    '        <hp:noteLine length="-1" type="SOLID" width="0.12 mm" color="#000000"/>\n'
+    '        <hp:noteSpacing betweenNotes="283" belowLine="567" aboveLine="850"/>\n'
+    '        <hp:numbering type="CONTINUOUS" newNum="1"/>\n'
+    '        <hp:placement place="EACH_COLUMN" beneathText="0"/>\n'
+    '      </hp:footNotePr>\n'
+    '      <hp:endNotePr>\n'
+    '        <hp:autoNumFormat type="DIGIT" userChar="" prefixChar="" suffixChar=")" supscript="0"/>\n'
+    '        <hp:noteLine length="14692344" type="SOLID" width="0.12 mm" color="#000000"/>\n'
+    '        <hp:noteSpacing betweenNotes="0" belowLine="567" aboveLine="850"/>\n'
+    '        <hp:numbering type="CONTINUOUS" newNum="1"/>\n'
+    '        <hp:placement place="END_OF_DOCUMENT" beneathText="0"/>\n'
+    '      </hp:endNotePr>\n'
+    + _PAGE_BORDER_FILLS
+    + '    </hp:secPr>'
+)
+
+
+@lru_cache(maxsize=32)
+def _secpr_xml(pw, ph, ml, mr, mt, mb):
+    """섹션 속성 XML – 쪽 크기·여백 조합별로 한 번만 만들어 캐시"""
+    return _SECPR_TPL % dict(pw=pw, ph=ph, ml=ml, mr=mr, mt=mt, mb=mb,
+                             hdr=_HEADER_FOOTER_HWP, ftr=_HEADER_FOOTER_HWP)
+
+
+# 섹션 첫 단락 (secPr + 단 설정 + 쪽번호) % 템플릿
+_SETUP_PARA_TPL = (
+    '  <hp:p id="%(pid)d" paraPrIDRef="0" styleIDRef="0"'
+    ' pageBreak="0" columnBreak="0" merged="0">\n'
+    '    <hp:run charPrIDRef="0">\n'
+    '      %(secpr)s\n'
+    '      <hp:ctrl>\n'
+    '        <hp:colPr id="0" type="NEWSPAPER" layout="LEFT"'
+    ' colCount="1" sameSz="1" sameGap="0"/>\n'
+    '      </hp:ctrl>\n'
+    '      <hp:ctrl>\n'
+    '        <hp:pageNum pos="BOTTOM_CENTER" formatType="DIGIT" sideChar="-"/>\n'
+    '      </hp:ctrl>\n'
+    '    </hp:run>\n'
+    '    <hp:run charPrIDRef="0">\n'
+    '      <hp:t/>\n'
+    '    </hp:run>\n'
+    '    <hp:linesegarray>\n'
+    '      <hp:lineseg textpos="0" vertpos="0" vertsize="1000" textheight="1000"'
+    ' baseline="850" spacing="600" horzpos="0" horzsize="42520" flags="393216"/>\n'
+    '    </hp:linesegarray>\n'
+    '  </hp:p>\n'
+)
+
+
+# ─── 고정 패키지 항목 (UTF-8 bytes) ───────────────────────────────
+_CONTAINER_XML = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<ocf:container'
+    ' xmlns:ocf="urn:oasis:names:tc:opendocument:xmlns:container"'
+    ' xmlns:hpf="http://www.hancom.co.kr/schema/2011/hpf">\n'
+    '  <ocf:rootfiles>\n'
+    '    <ocf:rootfile full-path="Contents/content.hpf"'
+    ' media-type="application/hwpml-package+xml"/>\n'
+    '    <ocf:rootfile full-path="Preview/PrvText.txt"'
+    ' media-type="text/plain"/>\n'
+    '  </ocf:rootfiles>\n'
+    '</ocf:container>'
+).encode('utf-8')
+
+_VERSION_XML = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<hv:HCFVersion'
+    ' xmlns:hv="http://www.hancom.co.kr/hwpml/2011/version"'
+    ' tagetApplication="WORDPROCESSOR"'
+    ' major="5" minor="1" micro="1" buildNumber="0"'
+    ' os="1" xmlVersion="1.5"'
+    ' application="Hancom Office Hangul"'
+    ' appVersion="13, 0, 0, 1408"/>'
+).encode('utf-8')
+
+_SETTINGS_XML = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<ha:HWPApplicationSetting'
+    ' xmlns:ha="http://www.hancom.co.kr/hwpml/2011/app"'
+    ' xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">\n'
+    '  <ha:CaretPosition listIDRef="0" paraIDRef="0" pos="0"/>\n'
+    '</ha:HWPApplicationSetting>'
+).encode('utf-8')
+
+# Contents/content.hpf – 책 제목과 작성 시각만 책마다 다름 (나머지는 고정 bytes 템플릿)
+_CONTENT_HPF_TPL = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<opf:package'
+    ' xmlns:opf="http://www.idpf.org/2007/opf/"'
+    ' xmlns:dc="http://purl.org/dc/elements/1.1/"'
+    ' version="" unique-identifier="" id="">\n'
+    '  <opf:metadata>\n'
+    '    <dc:title>%(title)b</dc:title>\n'
+    '    <dc:language>ko</dc:language>\n'
+    '    <opf:meta name="CreatedDate" content="text">%(now)b</opf:meta>\n'
+    '    <opf:meta name="ModifiedDate" content="text">%(now)b</opf:meta>\n'
+    '    <opf:meta name="creator" content="text"/>\n'
+    '    <opf:meta name="description" content="text"/>\n'
+    '  </opf:metadata>\n'
+    '  <opf:manifest>\n'
+    '    <opf:item id="header" href="Contents/header.xml"'
+    ' media-type="application/xml"/>\n'
+    '    <opf:item id="section0" href="Contents/section0.xml"'
+    ' media-type="application/xml"/>\n'
+    '    <opf:item id="settings" href="settings.xml"'
+    ' media-type="application/xml"/>\n'
+    '  </opf:manifest>\n'
+    '  <opf:spine>\n'
+    '    <opf:itemref idref="header"/>\n'
+    '    <opf:itemref idref="section0"/>\n'
+    '  </opf:spine>\n'
+    '</opf:package>'
+).encode('utf-8')
+
+
+def _stored_zipinfo(name):
+    """무압축(STORED) ZIP 항목 정보 – writestr(name) 과 같은 수정 시각·권한 사용"""
+    info = zipfile.ZipInfo(name, date_time=time.localtime(time.time())[:6])
+    info.compress_type = zipfile.ZIP_STORED
+    info.external_attr = 0o600 << 16
+    return info
+
+
+# ─── 단락 템플릿 ──────────────────────────────────────────────────
+@lru_cache(maxsize=32)
+def _para_template(para_pr_id, char_pr_id, style_id, page_break, empty):
     """
-    OWPML 기반 HWPX 전자책 생성기.
-    Canine89/hwpxskill 의 base 템플릿 구조를 따릅니다.
+    hp:p 단락 % 템플릿 (UTF-8 bytes) – 단락 id(%d)와 본문(%b)만 남김
+    스타일 조합은 몇 가지뿐이므로 조합별로 한 번만 만들어 캐시
     """
+    head = (
+        f'  <hp:p id="%d" paraPrIDRef="{para_pr_id}"'
+        f' styleIDRef="{style_id}" pageBreak="{1 if page_break else 0}"'
+        f' columnBreak="0" merged="0">\n'
+    )
+    if empty:
+        return (head + (
+            f'    <hp:run charPrIDRef="{char_pr_id}"/>\n'
+            '  </hp:p>\n'
+        )).encode('utf-8')
+    return (head + (
+        f'    <hp:run charPrIDRef="{char_pr_id}">\n'
+        '      <hp:t>%b</hp:t>\n'
+        '    </hp:run>\n'
+        '  </hp:p>\n'
+    )).encode('utf-8')
+
+
+def _styled_para(para_pr_id, char_pr_id, style_id, prefix=''):
+    """
+    스타일이 고정된 단락 메서드 생성 (_body, _h2 등)
+    해당 스타일의 템플릿을 미리 잡아 두고 호출마다 단락 id 와 본문만 채움
+    """
+    tmpl = _para_template(para_pr_id, char_pr_id, style_id, False, False)
+    empty_tmpl = _para_template(para_pr_id, char_pr_id, style_id, False, True)
 
-    def __init__(self, config=None):
-        self.config = config or load_config()
-        self.output_dir = self.config.get('output_dir', './static/output')
-        os.makedirs(self.output_dir, exist_ok=True)
-        self._para_id = 0
-
-    def _new_pid(self):
-        pid = self._para_id
-        self._para_id += 1
-        return str(pid)
-
-    # ================================================================
-    # mimetype
-    # ================================================================
-    def _mimetype(self):
-        return b'application/hwp+zip'
-
-    # ================================================================
-    # META-INF/container.xml
-    # ================================================================
-    def _container_xml(self):
-        return (
-            "<?xml version='1.0' encoding='UTF-8'?>\n"
-            '<ocf:container'
-            ' xmlns:ocf="urn:oasis:names:tc:opendocument:xmlns:container"'
-            ' xmlns:hpf="http://www.hancom.co.kr/schema/2011/hpf">\n'
-            '  <ocf:rootfiles>\n'
-            '    <ocf:rootfile full-path="Contents/content.hpf"'
-            ' media-type="application/hwpml-package+xml"/>\n'
-            '    <ocf:rootfile full-path="Preview/PrvText.txt"'
-            ' media-type="text/plain"/>\n'
-            '  </ocf:rootfiles>\n'
-            '</ocf:container>'
-        )
-
-    # ================================================================
-    # version.xml  – 레퍼런스 템플릿과 동일한 포맷
-    # ================================================================
-    def _version_xml(self):
-        return (
-            "<?xml version='1.0' encoding='UTF-8'?>\n"
-            '<hv:HCFVersion'
-            ' xmlns:hv="http://www.hancom.co.kr/hwpml/2011/version"'
-            ' tagetApplication="WORDPROCESSOR"'
-            ' major="5" minor="1" micro="1" buildNumber="0"'
-            ' os="1" xmlVersion="1.5"'
-            ' application="Hancom Office Hangul"'
-            ' appVersion="13, 0, 0, 1408"/>'
-        )
-
-    # ================================================================
-    # settings.xml
-    # ================================================================
-    def _settings_xml(self):
-        return (
-            "<?xml version='1.0' encoding='UTF-8'?>\n"
-            '<ha:HWPApplicationSetting'
-            ' xmlns:ha="http://www.hancom.co.kr/hwpml/2011/app"'
-            ' xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">\n'
-            '  <ha:CaretPosition listIDRef="0" paraIDRef="0" pos="0"/>\n'
-            '</ha:HWPApplicationSetting>'
-        )
-
-    # ================================================================
-    # Contents/content.hpf  (OPF 패키지 매니페스트)
-    # ================================================================
-    def _content_hpf(self, title):
-        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
-        return (
-            "<?xml version='1.0' encoding='UTF-8'?>\n"
-            '<opf:package'
-            ' xmlns:opf="http://www.idpf.org/2007/opf/"'
-            ' xmlns:dc="http://purl.org/dc/elements/1.1/"'
-            ' version="" unique-identifier="" id="">\n'
-            '  <opf:metadata>\n'
-            f'    <dc:title>{_esc(title)}</dc:title>\n'
-            '    <dc:language>ko</dc:language>\n'
-            f'    <opf:meta name="CreatedDate" content="text">{now}</opf:meta>\n'
-            f'    <opf:meta name="ModifiedDate" content="text">{now}</opf:meta>\n'
-            '    <opf:meta name="creator" content="text"/>\n'
-            '    <opf:meta name="description" content="text"/>\n'
-            '  </opf:metadata>\n'
-            '  <opf:manifest>\n'
-            '    <opf:item id="header" href="Contents/header.xml"'
-            ' media-type="application/xml"/>\n'
-            '    <opf:item id="section0" href="Contents/section0.xml"'
-            ' media-type="application/xml"/>\n'
-            '    <opf:item id="settings" href="settings.xml"'
-            ' media-type="application/xml"/>\n'
-            '  </opf:manifest>\n'
-            '  <opf:spine>\n'
-            '    <opf:itemref idref="header"/>\n'
-            '    <opf:itemref idref="section0"/>\n'
-            '  </opf:spine>\n'
-            '</opf:package>'
-        )
-
-    # ================================================================
-    # Contents/header.xml
-    # 레퍼런스: version="1.5", itemCnt 필수
-    # ================================================================
-    def _header_xml(self, fs_hwp, hs_hwp, ss_hwp, small_hwp, ls_pct):
-        return f"""<?xml version='1.0' encoding='UTF-8'?>
+    def method(self, text):
+        if prefix:
+            text = prefix + text
+        if not text:
+            return empty_tmpl % self._new_pid()
+        return tmpl % (self._new_pid(), _esc_bytes(text))
+    return method
+
+
+_EMPTY_PARA_TPL = _para_template(0, 0, 0, False, True)
+_BULLET_TPL     = _para_template(4, 0, 5, False, False)
+
+
+# ─── Contents/header.xml 템플릿 ───────────────────────────────────
+# 폰트·테두리(앞부분)와 스타일(뒷부분)은 고정이므로 import 시 UTF-8 bytes 로 한 번만 인코딩하고
+# 글자 크기·줄간격 5개 값이 들어가는 글자/문단 모양 부분만 format 으로 채움
+# 여러 번 반복되는 typeInfo·글자 모양 기본값 줄은 상수 하나로 공유
+_TYPEINFO_KR = (
+    '          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"\n'
+    '                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>\n'
+)
+_TYPEINFO_SANS = (
+    '          <hh:typeInfo familyType="4" weight="5" proportion="4" contrast="0"\n'
+    '                       strokeVariation="2" armStyle="1" letterform="1" midline="2" xHeight="4"/>\n'
+)
+_TYPEINFO_SERIF = (
+    '          <hh:typeInfo familyType="2" weight="5" proportion="6" contrast="5"\n'
+    '                       strokeVariation="2" armStyle="2" letterform="1" midline="2" xHeight="4"/>\n'
+)
+# 언어별 글꼴 표: (lang, ((글꼴 이름, typeInfo), ...)) – 글꼴 id 는 순서대로 0, 1, 2...
+_FONTFACES = (
+    ('HANGUL',   (('함초롬돋움', _TYPEINFO_KR), ('함초롬바탕', _TYPEINFO_KR), ('맑은 고딕', _TYPEINFO_KR))),
+    ('LATIN',    (('Arial', _TYPEINFO_SANS), ('Times New Roman', _TYPEINFO_SERIF))),
+    ('HANJA',    (('함초롬돋움', _TYPEINFO_KR), ('함초롬바탕', _TYPEINFO_KR))),
+    ('JAPANESE', (('함초롬돋움', _TYPEINFO_KR), ('함초롬바탕', _TYPEINFO_KR))),
+    ('OTHER',    (('Arial', _TYPEINFO_SANS),)),
+    ('SYMBOL',   (('Symbol', _TYPEINFO_SANS),)),
+    ('USER',     (('Arial', _TYPEINFO_SANS),)),
+)
+
+
+def _build_fontfaces():
+    """<hh:fontfaces> 블록 – 언어별 글꼴 표로 import 시 한 번만 생성"""
+    out = ['    <hh:fontfaces>\n']
+    for lang, fonts in _FONTFACES:
+        out.append(f'      <hh:fontface lang="{lang}" itemCnt="{len(fonts)}">\n')
+        for font_id, (face, type_info) in enumerate(fonts):
+            out.append(f'        <hh:font id="{font_id}" face="{face}" type="TTF" isEmbedded="false">\n')
+            out.append(type_info)
+            out.append('        </hh:font>\n')
+        out.append('      </hh:fontface>\n')
+    out.append('    </hh:fontfaces>\n')
+    return ''.join(out)
+
+
+_CHAR_PR_DEFAULTS = (
+    '        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>\n'
+    '        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>\n'
+    '        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>\n'
+    '        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>\n'
+)
+
+_HEADER_XML_PREFIX = """<?xml version='1.0' encoding='UTF-8'?>
 <hh:head xmlns:hh="http://www.hancom.co.kr/hwpml/2011/head"
          xmlns:hc="http://www.hancom.co.kr/hwpml/2011/core"
          version="1.5" secCnt="1">
@@ -170,71 +343,7 @@ class EbookHwpxGenerator:
   <hh:refList>
 
     <!-- ── 폰트 ── -->
-    <hh:fontfaces>
-      <hh:fontface lang="HANGUL" itemCnt="3">
-        <hh:font id="0" face="함초롬돋움" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-        <hh:font id="1" face="함초롬바탕" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-        <hh:font id="2" face="맑은 고딕" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="LATIN" itemCnt="2">
-        <hh:font id="0" face="Arial" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="4" weight="5" proportion="4" contrast="0"
-                       strokeVariation="2" armStyle="1" letterform="1" midline="2" xHeight="4"/>
-        </hh:font>
-        <hh:font id="1" face="Times New Roman" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="5" proportion="6" contrast="5"
-                       strokeVariation="2" armStyle="2" letterform="1" midline="2" xHeight="4"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="HANJA" itemCnt="2">
-        <hh:font id="0" face="함초롬돋움" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-        <hh:font id="1" face="함초롬바탕" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="JAPANESE" itemCnt="2">
-        <hh:font id="0" face="함초롬돋움" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-        <hh:font id="1" face="함초롬바탕" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="2" weight="8" proportion="4" contrast="0"
-                       strokeVariation="1" armStyle="1" letterform="1" midline="1" xHeight="1"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="OTHER" itemCnt="1">
-        <hh:font id="0" face="Arial" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="4" weight="5" proportion="4" contrast="0"
-                       strokeVariation="2" armStyle="1" letterform="1" midline="2" xHeight="4"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="SYMBOL" itemCnt="1">
-        <hh:font id="0" face="Symbol" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="4" weight="5" proportion="4" contrast="0"
-                       strokeVariation="2" armStyle="1" letterform="1" midline="2" xHeight="4"/>
-        </hh:font>
-      </hh:fontface>
-      <hh:fontface lang="USER" itemCnt="1">
-        <hh:font id="0" face="Arial" type="TTF" isEmbedded="false">
-          <hh:typeInfo familyType="4" weight="5" proportion="4" contrast="0"
-                       strokeVariation="2" armStyle="1" letterform="1" midline="2" xHeight="4"/>
-        </hh:font>
-      </hh:fontface>
-    </hh:fontfaces>
-
+{fontfaces}
     <!-- ── 테두리/채우기 (itemCnt="2") ── -->
     <hh:borderFills itemCnt="2">
       <hh:borderFill id="0" themeType="NONE">
@@ -261,60 +370,38 @@ class EbookHwpxGenerator:
       </hh:borderFill>
     </hh:borderFills>
 
-    <!-- ── 글자 모양 (itemCnt="6") ──
+""".format(fontfaces=_build_fontfaces()).encode('utf-8')
+
+_HEADER_XML_PROPS_TEMPLATE = """    <!-- ── 글자 모양 (itemCnt="6") ──
          id=0: 본문  id=1: H1  id=2: H2  id=3: 라벨  id=4: bold  id=5: 목차 -->
     <hh:charProperties itemCnt="6">
       <hh:charPr id="0" height="{fs_hwp}" textColor="#000000" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-      </hh:charPr>
+{char_defaults}      </hh:charPr>
       <hh:charPr id="1" height="{hs_hwp}" textColor="#1A1A2E" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="2" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:bold/>
+{char_defaults}        <hh:bold/>
       </hh:charPr>
       <hh:charPr id="2" height="{ss_hwp}" textColor="#1A1A2E" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="2" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:bold/>
+{char_defaults}        <hh:bold/>
       </hh:charPr>
       <hh:charPr id="3" height="{small_hwp}" textColor="#646464" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-      </hh:charPr>
+{char_defaults}      </hh:charPr>
       <hh:charPr id="4" height="{fs_hwp}" textColor="#000000" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:bold/>
+{char_defaults}        <hh:bold/>
       </hh:charPr>
       <hh:charPr id="5" height="{fs_hwp}" textColor="#000000" shadeColor="#FFFFFF"
                  useFontSpace="false" useKerning="false" symMark="NONE" borderFillIDRef="0">
         <hh:fontRef hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:ratio hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:spacing hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-        <hh:relSz hangul="100" latin="100" hanja="100" japanese="100" other="100" symbol="100" user="100"/>
-        <hh:offset hangul="0" latin="0" hanja="0" japanese="0" other="0" symbol="0" user="0"/>
-      </hh:charPr>
+{char_defaults}      </hh:charPr>
     </hh:charProperties>
 
     <!-- ── 탭 속성 (itemCnt="2") ── -->
@@ -421,7 +508,9 @@ class EbookHwpxGenerator:
       </hh:paraPr>
     </hh:paraProperties>
 
-    <!-- ── 스타일 (itemCnt="6") ── -->
+""".replace('{char_defaults}', _CHAR_PR_DEFAULTS)
+
+_HEADER_XML_SUFFIX = """    <!-- ── 스타일 (itemCnt="6") ── -->
     <hh:styles itemCnt="6">
       <hh:style id="0" type="PARA" name="바탕글" engName="Normal"
                 paraPrIDRef="0" charPrIDRef="0" nextStyleIDRef="0"
@@ -445,7 +534,98 @@ class EbookHwpxGenerator:
 
   </hh:refList>
 
-</hh:head>"""
+</hh:head>""".encode('utf-8')
+
+
+@lru_cache(maxsize=32)
+def _header_xml_bytes(fs_hwp, hs_hwp, ss_hwp, small_hwp, ls_pct):
+    """header.xml 전체 (UTF-8 bytes) – 글자 크기·줄간격 조합별로 한 번만 만들어 캐시"""
+    props = _HEADER_XML_PROPS_TEMPLATE.format(
+        fs_hwp=fs_hwp, hs_hwp=hs_hwp, ss_hwp=ss_hwp,
+        small_hwp=small_hwp, ls_pct=ls_pct,
+    )
+    return _HEADER_XML_PREFIX + props.encode('utf-8') + _HEADER_XML_SUFFIX
+
+# ─── Contents/section0.xml 루트 여는 태그 (UTF-8 bytes) ───────────
+_SECTION_XML_OPEN = (
+    "<?xml version='1.0' encoding='UTF-8'?>\n"
+    '<hs:sec'
+    ' xmlns:ha="http://www.hancom.co.kr/hwpml/2011/app"'
+    ' xmlns:hp="http://www.hancom.co.kr/hwpml/2011/paragraph"'
+    ' xmlns:hp10="http://www.hancom.co.kr/hwpml/2016/paragraph"'
+    ' xmlns:hs="http://www.hancom.co.kr/hwpml/2011/section"'
+    ' xmlns:hc="http://www.hancom.co.kr/hwpml/2011/core"'
+    ' xmlns:hh="http://www.hancom.co.kr/hwpml/2011/head"'
+    ' xmlns:hhs="http://www.hancom.co.kr/hwpml/2011/history"'
+    ' xmlns:hm="http://www.hancom.co.kr/hwpml/2011/master-page"'
+    ' xmlns:hpf="http://www.hancom.co.kr/schema/2011/hpf"'
+    ' xmlns:dc="http://purl.org/dc/elements/1.1/"'
+    ' xmlns:opf="http://www.idpf.org/2007/opf/"'
+    ' xmlns:ooxmlchart="http://www.hancom.co.kr/hwpml/2016/ooxmlchart"'
+    ' xmlns:hwpunitchar="http://www.hancom.co.kr/hwpml/2016/HwpUnitChar"'
+    ' xmlns:epub="http://www.idpf.org/2007/ops"'
+    ' xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">\n'
+).encode('utf-8')
+# section0.xml 을 압축기로 넘기는 단위 (작은 write 를 모아 compress 호출 횟수를 줄임)
+_SECTION_FLUSH_SIZE = 64 * 1024
+
+
+class EbookHwpxGenerator:
+    """
+    OWPML 기반 HWPX 전자책 생성기.
+    Canine89/hwpxskill 의 base 템플릿 구조를 따릅니다.
+    """
+
+    def __init__(self, config=None):
+        self.config = config or load_config()
+        self.output_dir = self.config.get('output_dir', './static/output')
+        os.makedirs(self.output_dir, exist_ok=True)
+        self._para_id = 0
+
+    def _new_pid(self):
+        """다음 단락 id (정수 그대로 반환 - 템플릿의 %d 가 바로 문자열로 씀)"""
+        pid = self._para_id
+        self._para_id = pid + 1
+        return pid
+
+    # ================================================================
+    # mimetype
+    # ================================================================
+    def _mimetype(self):
+        return b'application/hwp+zip'
+
+    # ================================================================
+    # META-INF/container.xml
+    # ================================================================
+    def _container_xml(self):
+        return _CONTAINER_XML
+
+    # ================================================================
+    # version.xml  – 레퍼런스 템플릿과 동일한 포맷
+    # ================================================================
+    def _version_xml(self):
+        return _VERSION_XML
+
+    # ================================================================
+    # settings.xml
+    # ================================================================
+    def _settings_xml(self):
+        return _SETTINGS_XML
+
+    # ================================================================
+    # Contents/content.hpf  (OPF 패키지 매니페스트)
+    # ================================================================
+    def _content_hpf(self, title):
+        now = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ').encode('ascii')
+        return _CONTENT_HPF_TPL % {b'title': _esc_bytes(title), b'now': now}
+
+    # ================================================================
+    # Contents/header.xml
+    # 레퍼런스: version="1.5", itemCnt 필수
+    # ================================================================
+    def _header_xml(self, fs_hwp, hs_hwp, ss_hwp, small_hwp, ls_pct):
+        """header.xml (UTF-8 bytes)"""
+        return _header_xml_bytes(fs_hwp, hs_hwp, ss_hwp, small_hwp, ls_pct)
 
     # ================================================================
     # Contents/section0.xml
@@ -458,52 +638,7 @@ class EbookHwpxGenerator:
         pw/ph = 페이지 너비/높이 (HWPUNIT)
         ml/mr/mt/mb = 여백 (HWPUNIT)
         """
-        hdr = _mm_to_hwp(15)
-        ftr = _mm_to_hwp(15)
-
-        return (
-            f'<hp:secPr id="0" textDirection="HORIZONTAL" spaceColumns="1134"'
-            f' tabStop="8000" tabStopVal="4000" tabStopUnit="HWPUNIT"'
-            f' outlineShapeIDRef="0" memoShapeIDRef="0"'
-            f' textVerticalWidthHead="0" masterPageCnt="0">\n'
-            f'      <hp:grid lineGrid="0" charGrid="0" wonggojiFormat="0"/>\n'
-            f'      <hp:startNum pageStartsOn="BOTH" page="0" pic="0" tbl="0" equation="0"/>\n'
-            f'      <hp:visibility hideFirstHeader="0" hideFirstFooter="0"'
-            f' hideFirstMasterPage="0" border="SHOW_ALL" fill="SHOW_ALL"'
-            f' hideFirstPageNum="0" hideFirstEmptyLine="0" showLineNumber="0"/>\n'
-            f'      <hp:lineNumberShape restartType="0" countBy="0" distance="0" startNumber="0"/>\n'
-            f'      <hp:pagePr landscape="WIDELY" width="{pw}" height="{ph}" gutterType="LEFT_ONLY">\n'
-            f'        <hp:margin header="{hdr}" footer="{ftr}" gutter="0"'
-            f' left="{ml}" right="{mr}" top="{mt}" bottom="{mb}"/>\n'
-            f'      </hp:pagePr>\n'
-            f'      <hp:footNotePr>\n'
-            f'        <hp:autoNumFormat type="DIGIT" userChar="" prefixChar="" suffixChar=")" supscript="0"/>\n'
-            f'        <hp:noteLine length="-1" type="SOLID" width="0.12 mm" color="#000000"/>\n'
-            f'        <hp:noteSpacing betweenNotes="283" belowLine="567" aboveLine="850"/>\n'
-            f'        <hp:numbering type="CONTINUOUS" newNum="1"/>\n'
-            f'        <hp:placement place="EACH_COLUMN" beneathText="0"/>\n'
-            f'      </hp:footNotePr>\n'
-            f'      <hp:endNotePr>\n'
-            f'        <hp:autoNumFormat type="DIGIT" userChar="" prefixChar="" suffixChar=")" supscript="0"/>\n'
-            f'        <hp:noteLine length="14692344" type="SOLID" width="0.12 mm" color="#000000"/>\n'
-            f'        <hp:noteSpacing betweenNotes="0" belowLine="567" aboveLine="850"/>\n'
-            f'        <hp:numbering type="CONTINUOUS" newNum="1"/>\n'
-            f'        <hp:placement place="END_OF_DOCUMENT" beneathText="0"/>\n'
-            f'      </hp:endNotePr>\n'
-            f'      <hp:pageBorderFill type="BOTH" borderFillIDRef="0"'
-            f' textBorder="PAPER" headerInside="0" footerInside="0" fillArea="PAPER">\n'
-            f'        <hp:offset left="1417" right="1417" top="1417" bottom="1417"/>\n'
-            f'      </hp:pageBorderFill>\n'
-            f'      <hp:pageBorderFill type="EVEN" borderFillIDRef="0"'
-            f' textBorder="PAPER" headerInside="0" footerInside="0" fillArea="PAPER">\n'
-            f'        <hp:offset left="1417" right="1417" top="1417" bottom="1417"/>\n'
-            f'      </hp:pageBorderFill>\n'
-            f'      <hp:pageBorderFill type="ODD" borderFillIDRef="0"'
-            f' textBorder="PAPER" headerInside="0" footerInside="0" fillArea="PAPER">\n'
-            f'        <hp:offset left="1417" right="1417" top="1417" bottom="1417"/>\n'
-            f'      </hp:pageBorderFill>\n'
-            f'    </hp:secPr>'
-        )
+        return _secpr_xml(pw, ph, ml, mr, mt, mb)
 
     def _setup_para(self, secpr_xml):
         """
@@ -511,80 +646,40 @@ class EbookHwpxGenerator:
         run1: secPr + ctrl(colPr) + ctrl(pageNum 쪽번호매기기)
         run2: 빈 텍스트
         """
-        pid = self._new_pid()
-        return (
-            f'  <hp:p id="{pid}" paraPrIDRef="0" styleIDRef="0"'
-            f' pageBreak="0" columnBreak="0" merged="0">\n'
-            f'    <hp:run charPrIDRef="0">\n'
-            f'      {secpr_xml}\n'
-            f'      <hp:ctrl>\n'
-            f'        <hp:colPr id="0" type="NEWSPAPER" layout="LEFT"'
-            f' colCount="1" sameSz="1" sameGap="0"/>\n'
-            f'      </hp:ctrl>\n'
-            f'      <hp:ctrl>\n'
-            f'        <hp:pageNum pos="BOTTOM_CENTER" formatType="DIGIT" sideChar="-"/>\n'
-            f'      </hp:ctrl>\n'
-            f'    </hp:run>\n'
-            f'    <hp:run charPrIDRef="0">\n'
-            f'      <hp:t/>\n'
-            f'    </hp:run>\n'
-            f'    <hp:linesegarray>\n'
-            f'      <hp:lineseg textpos="0" vertpos="0" vertsize="1000" textheight="1000"'
-            f' baseline="850" spacing="600" horzpos="0" horzsize="42520" flags="393216"/>\n'
-            f'    </hp:linesegarray>\n'
-            f'  </hp:p>\n'
-        )
+        return _SETUP_PARA_TPL % {'pid': self._new_pid(), 'secpr': secpr_xml}
 
     def _make_para(self, text, para_pr_id=0, char_pr_id=0,
                    page_break=False, style_id=0):
-        """일반 콘텐츠 단락 hp:p 생성"""
+        """일반 콘텐츠 단락 hp:p 생성 (UTF-8 bytes)"""
         pid = self._new_pid()
-        pb = '1' if page_break else '0'
-
         if not text:
-            return (
-                f'  <hp:p id="{pid}" paraPrIDRef="{para_pr_id}"'
-                f' styleIDRef="{style_id}" pageBreak="{pb}"'
-                f' columnBreak="0" merged="0">\n'
-                f'    <hp:run charPrIDRef="{char_pr_id}"/>\n'
-                f'  </hp:p>\n'
-            )
-        return (
-            f'  <hp:p id="{pid}" paraPrIDRef="{para_pr_id}"'
-            f' styleIDRef="{style_id}" pageBreak="{pb}"'
-            f' columnBreak="0" merged="0">\n'
-            f'    <hp:run charPrIDRef="{char_pr_id}">\n'
-            f'      <hp:t>{_esc(text)}</hp:t>\n'
-            f'    </hp:run>\n'
-            f'  </hp:p>\n'
-        )
+            return _para_template(para_pr_id, char_pr_id, style_id, page_break, True) % pid
+        return _para_template(para_pr_id, char_pr_id, style_id, page_break, False) % (pid, _esc_bytes(text))
 
     # ── 편의 단락 메서드 ─────────────────────────────────────────
     def _h1(self, text, page_break=False):
         return self._make_para(text, para_pr_id=1, char_pr_id=1,
                                style_id=2, page_break=page_break)
 
-    def _h2(self, text):
-        return self._make_para(text, para_pr_id=2, char_pr_id=2, style_id=3)
-
-    def _body(self, text):
-        return self._make_para(text, para_pr_id=0, char_pr_id=0, style_id=1)
-
-    def _label(self, text):
-        return self._make_para(text, para_pr_id=0, char_pr_id=3, style_id=0)
-
-    def _bold(self, text):
-        return self._make_para(text, para_pr_id=0, char_pr_id=4, style_id=1)
-
-    def _toc(self, text):
-        return self._make_para(text, para_pr_id=3, char_pr_id=5, style_id=4)
-
-    def _bullet(self, text):
-        return self._make_para('• ' + text, para_pr_id=4, char_pr_id=0,
-                               style_id=5)
+    _h2     = _styled_para(para_pr_id=2, char_pr_id=2, style_id=3)
+    _body   = _styled_para(para_pr_id=0, char_pr_id=0, style_id=1)
+    _label  = _styled_para(para_pr_id=0, char_pr_id=3, style_id=0)
+    _bold   = _styled_para(para_pr_id=0, char_pr_id=4, style_id=1)
+    _toc    = _styled_para(para_pr_id=3, char_pr_id=5, style_id=4)
+    _bullet = _styled_para(para_pr_id=4, char_pr_id=0, style_id=5, prefix='• ')
 
     def _empty(self):
-        return self._make_para('', para_pr_id=0, char_pr_id=0, style_id=0)
+        return _EMPTY_PARA_TPL % self._new_pid()
+
+    def _bullets(self, items):
+        """
+        글머리표 단락 여러 개를 한 번에 생성 (단락 목록 반환)
+        단락 id 범위를 한 번에 잡고 같은 템플릿으로 채움 - 항목마다 _bullet 호출하지 않음
+        """
+        start = self._para_id
+        self._para_id = start + len(items)
+        return [_BULLET_TPL % (pid, _esc_bytes('• ' + text))
+                for pid, text in zip(range(start, self._para_id), items)]
 
     @staticmethod
     def _calc_content_height_pt(text, fs=11, hs_size=16, ss_size=13, ls=1.6,
@@ -597,94 +692,99 @@ class EbookHwpxGenerator:
             return 0.0
 
         # 줄당 전각 글자 수 (한글 기준: 1em = font_size pt)
-        chars_per_line = int(page_width_pt / fs)
-        chars_per_line_ss = int(page_width_pt / ss_size)
-
-        def _wrap_lines(s, cpl=chars_per_line):
-            return max(1, -(-len(s) // cpl))
-
-        # 단락 높이 계산 함수 (줄 수 * 줄높이 + prev마진 + next마진)
-        def _body_height(n_lines):
-            """본문 단락 (paraPr 0): next=2pt"""
-            return n_lines * (fs * ls) + 2.0
-
-        def _h2_height(n_lines):
-            """H2 단락 (paraPr 2): prev=6pt, next=3pt"""
-            return 6.0 + n_lines * (ss_size * ls) + 3.0
-
-        def _bold_height(n_lines):
-            """볼드 단락 (paraPr 0): next=2pt"""
-            return n_lines * (fs * ls) + 2.0
-
-        def _bullet_height(n_lines):
-            """불릿 단락 (paraPr 4): next=1pt"""
-            return n_lines * (fs * ls) + 1.0
-
-        def _empty_height():
-            """빈 단락: 1줄 높이 + next=2pt"""
-            return fs * ls + 2.0
-
-        total_pt = 0.0
+        cpl    = int(page_width_pt / fs)
+        cpl_ss = int(page_width_pt / ss_size)
+
+        # 줄마다 쓰는 패턴 메서드는 지역 변수로 묶어 속성 조회를 줄임
+        match_h2, match_label = _H2_EQ_RE.match, _LABEL_RE.match
+        match_bullet, match_num = _BULLET_RE.match, _NUM_RE.match
+
+        # 줄 단위로는 정수(글꼴별 줄 수, 단락 마진별 단락 수)만 세고 높이(pt)는 마지막에 한 번에 계산
+        # 단락 높이 = 줄 수 * 줄높이 + prev마진 + next마진
+        #   본문·볼드 (paraPr 0): next=2pt / 불릿 (paraPr 4): next=1pt
+        #   H2 (paraPr 2): prev=6pt, next=3pt / 빈 단락: 1줄 + next=2pt
+        body_rows = 0   # 본문 글꼴 줄 수 (본문·볼드·불릿·빈 단락)
+        h2_rows   = 0   # 소제목 글꼴 줄 수
+        n_next2   = 0   # next=2pt 단락 수 (본문·볼드·빈 단락)
+        n_next1   = 0   # next=1pt 단락 수 (불릿)
+        n_h2      = 0   # H2 단락 수 (prev 6pt + next 3pt)
         for raw_line in text.split('\n'):
             stripped = raw_line.strip()
             if not stripped:
-                total_pt += _empty_height()
-                continue
-            # == 소제목 == → H2
-            if re.match(r'^={2,}\s*(.+?)\s*={2,}$', stripped):
-                title_text = re.match(r'^={2,}\s*(.+?)\s*={2,}$', stripped).group(1)
-                total_pt += _h2_height(_wrap_lines(title_text, chars_per_line_ss))
-                continue
-            # [라벨] 텍스트 → bold + body
-            bm = re.match(r'^\[([^\]]{2,20})\]\s*(.*)', stripped)
-            if bm:
-                label_txt = f'[ {bm.group(1)} ]'
-                total_pt += _bold_height(_wrap_lines(label_txt))
-                rest = bm.group(2).strip()
-                if rest:
-                    total_pt += _body_height(_wrap_lines(rest))
-                continue
-            # 불릿
-            if re.match(r'^[-•●▶►✓]\s+', stripped):
-                total_pt += _bullet_height(_wrap_lines('• ' + stripped[2:].strip()))
-                continue
-            # 번호 리스트
-            m2 = re.match(r'^(\d+)[.)]\s+(.+)', stripped)
-            if m2:
-                total_pt += _bullet_height(_wrap_lines(f'• {m2.group(1)}. {m2.group(2)}'))
+                body_rows += 1
+                n_next2 += 1
                 continue
+            # 첫 글자로 후보 패턴을 하나만 골라 검사 (일반 본문 줄은 정규식을 타지 않음)
+            c0 = stripped[0]
+            if c0 == '=':
+                # == 소제목 == → H2
+                m = match_h2(stripped)
+                if m:
+                    h2_rows += max(1, -(-len(m.group(1)) // cpl_ss))
+                    n_h2 += 1
+                    continue
+            elif c0 == '[':
+                # [라벨] 텍스트 → bold + body
+                bm = match_label(stripped)
+                if bm:
+                    body_rows += max(1, -(-len(f'[ {bm.group(1)} ]') // cpl))
+                    n_next2 += 1
+                    rest = bm.group(2).strip()
+                    if rest:
+                        body_rows += max(1, -(-len(rest) // cpl))
+                        n_next2 += 1
+                    continue
+            elif c0 in _BULLET_CHARS:
+                # 불릿
+                if match_bullet(stripped):
+                    body_rows += max(1, -(-len('• ' + stripped[2:].strip()) // cpl))
+                    n_next1 += 1
+                    continue
+            elif c0.isdigit():
+                # 번호 리스트
+                m2 = match_num(stripped)
+                if m2:
+                    body_rows += max(1, -(-len(f'• {m2.group(1)}. {m2.group(2)}') // cpl))
+                    n_next1 += 1
+                    continue
             # 일반 본문
-            total_pt += _body_height(_wrap_lines(stripped))
-        return total_pt
+            body_rows += max(1, -(-len(stripped) // cpl))
+            n_next2 += 1
+        return (body_rows * (fs * ls) + h2_rows * (ss_size * ls)
+                + n_next2 * 2.0 + n_next1 * 1.0 + n_h2 * 9.0)
 
     # ================================================================
     # section0.xml 전체 조립
     # ================================================================
-    def _section_xml(self, content_paras_xml, pw, ph, ml, mr, mt, mb):
+    def _write_section_xml(self, fp, paras, pw, ph, ml, mr, mt, mb):
+        """
+        section0.xml 을 바이너리 스트림 fp 에 기록
+        (문서 전체를 하나의 bytes 로 만들지 않고, UTF-8 bytes 단락을 재사용하는 bytearray 에
+         모았다가 _SECTION_FLUSH_SIZE 단위로 ZIP 압축기에 넘김)
+        """
         secpr_xml = self._secpr(pw, ph, ml, mr, mt, mb)
-        setup = self._setup_para(secpr_xml)
-        return (
-            "<?xml version='1.0' encoding='UTF-8'?>\n"
-            '<hs:sec'
-            ' xmlns:ha="http://www.hancom.co.kr/hwpml/2011/app"'
-            ' xmlns:hp="http://www.hancom.co.kr/hwpml/2011/paragraph"'
-            ' xmlns:hp10="http://www.hancom.co.kr/hwpml/2016/paragraph"'
-            ' xmlns:hs="http://www.hancom.co.kr/hwpml/2011/section"'
-            ' xmlns:hc="http://www.hancom.co.kr/hwpml/2011/core"'
-            ' xmlns:hh="http://www.hancom.co.kr/hwpml/2011/head"'
-            ' xmlns:hhs="http://www.hancom.co.kr/hwpml/2011/history"'
-            ' xmlns:hm="http://www.hancom.co.kr/hwpml/2011/master-page"'
-            ' xmlns:hpf="http://www.hancom.co.kr/schema/2011/hpf"'
-            ' xmlns:dc="http://purl.org/dc/elements/1.1/"'
-            ' xmlns:opf="http://www.idpf.org/2007/opf/"'
-            ' xmlns:ooxmlchart="http://www.hancom.co.kr/hwpml/2016/ooxmlchart"'
-            ' xmlns:hwpunitchar="http://www.hancom.co.kr/hwpml/2016/HwpUnitChar"'
-            ' xmlns:epub="http://www.idpf.org/2007/ops"'
-            ' xmlns:config="urn:oasis:names:tc:opendocument:xmlns:config:1.0">\n'
-            + setup
-            + content_paras_xml
-            + '</hs:sec>'
-        )
+        buf = bytearray(_SECTION_XML_OPEN)
+        buf += self._setup_para(secpr_xml).encode('utf-8')
+        for para in paras:
+            buf += para
+            if len(buf) >= _SECTION_FLUSH_SIZE:
+                fp.write(buf)
+                buf.clear()
+        buf += b'</hs:sec>'
+        fp.write(buf)
+
+    @staticmethod
+    def _preview_text(paras, limit=500):
+        """앞쪽 단락만 태그를 제거해 미리보기 텍스트 생성 (limit 자를 채우면 중단)"""
+        chunks = []
+        length = 0
+        for para in paras:
+            text = _TAG_RE.sub('', para.decode('utf-8'))
+            chunks.append(text)
+            length += len(text)
+            if length >= limit:
+                break
+        return ''.join(chunks)[:limit]
 
     # ================================================================
     # 메인 generate 메서드
@@ -722,7 +822,7 @@ class EbookHwpxGenerator:
         book_info = ebook_data.get('book_info', {})
         title     = book_info.get('book_title', '전자책')
         subtitle  = book_info.get('subtitle', '')
-        safe_title = re.sub(r'[^\w가-힣\s\-]', '', title)[:50].strip()
+        safe_title = _SAFE_TITLE_RE.sub('', title)[:50].strip()
         filename   = f"{safe_title}.hwpx"
         filepath   = os.path.join(self.output_dir, filename)
 
@@ -792,7 +892,7 @@ class EbookHwpxGenerator:
             cur_page += 1
             val_h = H1_HEIGHT
             problem = analysis_data.get('problem_solved', {})
-            for key in ('time', 'money', 'emotion'):
+            for _, key in _PROBLEM_FIELDS:
                 val = problem.get(key, '')
                 if val:
                     val_h += H2_HEIGHT + _text_height(val)
@@ -836,9 +936,7 @@ class EbookHwpxGenerator:
         if analysis:
             paras.append(self._h1('이 책이 주는 가치', page_break=True))
             problem = analysis.get('problem_solved', {})
-            for lbl, key in [('절약 시간', 'time'),
-                              ('비용 절감', 'money'),
-                              ('감정적 해방', 'emotion')]:
+            for lbl, key in _PROBLEM_FIELDS:
                 val = problem.get(key, '')
                 if val:
                     paras.append(self._h2(lbl))
@@ -858,49 +956,61 @@ class EbookHwpxGenerator:
                 else:
                     paras.append(self._empty())
 
-        # 챕터 본문
+        # 챕터 본문 (줄마다 쓰는 패턴·단락 메서드는 지역 변수로 묶어 속성 조회를 줄임)
+        match_h2, match_label = _H2_EQ_RE.match, _LABEL_RE.match
+        match_bullet, match_num = _BULLET_RE.match, _NUM_RE.match
+        add, body, bold = paras.append, self._body, self._bold
+        h2, bullet, empty = self._h2, self._bullet, self._empty
         for i, ch_data in enumerate(ebook_data.get('chapters_content', [])):
-            chapter = ch_data.get('chapter', {})
-            content = ch_data.get('content', '')
+            # 챕터 필드는 처음에 한 번씩만 꺼내 둠
+            chapter  = ch_data.get('chapter', {})
+            content  = ch_data.get('content', '')
+            phase    = chapter.get('phase', '')
+            ch_title = chapter.get('title', '')
+            before   = chapter.get('before_state', '')
+            after    = chapter.get('after_state', '')
 
-            paras.append(self._label(
-                f"CHAPTER {i+1}  ·  {chapter.get('phase', '')}"
-            ))
-            paras.append(self._h1(chapter.get('title', ''), page_break=True))
+            add(self._label(f"CHAPTER {i+1}  ·  {phase}"))
+            add(self._h1(ch_title, page_break=True))
 
-            before = chapter.get('before_state', '')
-            after  = chapter.get('after_state', '')
             if before:
-                paras.append(self._body(f"읽기 전: {before}"))
+                add(body(f"읽기 전: {before}"))
             if after:
-                paras.append(self._bold(f"읽고 난 후: {after}"))
-            paras.append(self._empty())
+                add(bold(f"읽고 난 후: {after}"))
+            add(empty())
 
+            # splitlines() 는 끝의 빈 줄과 \r 등 다른 줄바꿈 처리가 달라 빈 단락 수가 바뀌므로 split('\n') 유지
             for line in content.split('\n'):
-                stripped = line.strip()
-                if not stripped:
-                    paras.append(self._empty())
-                    continue
-                m = re.match(r'^={2,}\s*(.+?)\s*={2,}$', stripped)
-                if m:
-                    paras.append(self._h2(m.group(1)))
-                    continue
-                bm = re.match(r'^\[([^\]]{2,20})\]\s*(.*)', stripped)
-                if bm:
-                    label_txt = bm.group(1)
-                    rest = bm.group(2).strip()
-                    paras.append(self._bold(f'[ {label_txt} ]'))
-                    if rest:
-                        paras.append(self._body(rest))
+                # 빈 줄·공백만 있는 줄은 strip 없이 바로 빈 단락으로 (LLM 출력은 빈 줄이 많음)
+                if not line or line.isspace():
+                    add(empty())
                     continue
-                if re.match(r'^[-•●▶►✓]\s+', stripped):
-                    paras.append(self._bullet(stripped[2:].strip()))
-                    continue
-                m2 = re.match(r'^(\d+)[.)]\s+(.+)', stripped)
-                if m2:
-                    paras.append(self._bullet(f"{m2.group(1)}. {m2.group(2)}"))
-                    continue
-                paras.append(self._body(stripped))
+                stripped = line.strip()
+                c0 = stripped[0]
+                if c0 == '=':
+                    m = match_h2(stripped)
+                    if m:
+                        add(h2(m.group(1)))
+                        continue
+                elif c0 == '[':
+                    bm = match_label(stripped)
+                    if bm:
+                        label_txt = bm.group(1)
+                        rest = bm.group(2).strip()
+                        add(bold(f'[ {label_txt} ]'))
+                        if rest:
+                            add(body(rest))
+                        continue
+                elif c0 in _BULLET_CHARS:
+                    if match_bullet(stripped):
+                        add(bullet(stripped[2:].strip()))
+                        continue
+                elif c0.isdigit():
+                    m2 = match_num(stripped)
+                    if m2:
+                        add(bullet(f"{m2.group(1)}. {m2.group(2)}"))
+                        continue
+                add(body(stripped))
 
         # 에필로그
         epilogue = ebook_data.get('epilogue', '')
@@ -923,44 +1033,48 @@ class EbookHwpxGenerator:
             value = marketing.get('value_summary', {})
             if value:
                 paras.append(self._h2('독자에게 주는 가치'))
-                for key, lbl in [('time_saved', '절약 시간'),
-                                  ('money_saved', '비용 절감'),
-                                  ('mistakes_prevented', '방지 실수')]:
-                    if value.get(key):
-                        paras.append(self._bullet(f"{lbl}: {value[key]}"))
+                paras.extend(self._bullets([
+                    f"{lbl}: {value[key]}" for lbl, key in _VALUE_FIELDS if value.get(key)
+                ]))
 
         # ── XML 조립 (footer에서 자동 쪽번호 처리) ──────────────
-        content_xml = ''.join(paras)
-        section_xml = self._section_xml(
-            content_xml, page_w, page_h, ml_hwp, mr_hwp, mt_hwp, mb_hwp
-        )
         header_xml = self._header_xml(fs_hwp, hs_hwp, ss_hwp, small_hwp, ls_pct)
-        preview    = re.sub(r'<[^>]+>', '', content_xml)[:500]
+        preview    = self._preview_text(paras)
 
         # ── HWPX ZIP 패키징 ──────────────────────────────────────
-        buf = io.BytesIO()
-        with zipfile.ZipFile(buf, 'w', zipfile.ZIP_DEFLATED) as zf:
-            # mimetype: STORED, 첫 번째 항목
-            mime_info = zipfile.ZipInfo('mimetype')
-            mime_info.compress_type = zipfile.ZIP_STORED
-            zf.writestr(mime_info, self._mimetype())
-
-            zf.writestr('META-INF/container.xml',
-                        self._container_xml().encode('utf-8'))
-            zf.writestr('version.xml',
-                        self._version_xml().encode('utf-8'))
-            zf.writestr('settings.xml',
-                        self._settings_xml().encode('utf-8'))
-            zf.writestr('Contents/content.hpf',
-                        self._content_hpf(title).encode('utf-8'))
-            zf.writestr('Contents/header.xml',
-                        header_xml.encode('utf-8'))
-            zf.writestr('Contents/section0.xml',
-                        section_xml.encode('utf-8'))
-            zf.writestr('Preview/PrvText.txt',
-                        preview.encode('utf-8'))
-
-        with open(filepath, 'wb') as f:
-            f.write(buf.getvalue())
+        # 파일에 바로 기록 (ZIP 전체를 메모리에 만든 뒤 다시 복사하지 않음, 1MB 버퍼로 쓰기 횟수 절감)
+        # XML 은 낮은 압축 레벨에서도 충분히 줄어들므로 속도 우선 (level 1)
+        # 임시 파일에 다 쓴 뒤 os.replace 로 교체 (같은 제목을 동시에 생성하거나 쓰는 도중
+        # 다운로드해도 깨진 파일이 보이지 않음)
+        tmp_path = f'{filepath}.{os.urandom(8).hex()}.tmp'
+        try:
+            with open(tmp_path, 'wb', buffering=1 << 20) as f, \
+                    zipfile.ZipFile(f, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zf:
+                # mimetype: STORED, 첫 번째 항목
+                mime_info = zipfile.ZipInfo('mimetype')
+                mime_info.compress_type = zipfile.ZIP_STORED
+                zf.writestr(mime_info, self._mimetype())
+
+                # 1KB 안팎의 작은 항목은 압축 이득보다 deflate 비용이 커서 STORED 로 기록
+                # (deflate level 1 은 header.xml·section0.xml 처럼 큰 항목에만 사용)
+                zf.writestr(_stored_zipinfo('META-INF/container.xml'), self._container_xml())
+                zf.writestr(_stored_zipinfo('version.xml'), self._version_xml())
+                zf.writestr(_stored_zipinfo('settings.xml'), self._settings_xml())
+                zf.writestr(_stored_zipinfo('Contents/content.hpf'), self._content_hpf(title))
+                zf.writestr('Contents/header.xml', header_xml)
+                with zf.open('Contents/section0.xml', 'w') as fp:
+                    self._write_section_xml(
+                        fp, paras, page_w, page_h, ml_hwp, mr_hwp, mt_hwp, mb_hwp
+                    )
+                zf.writestr(_stored_zipinfo('Preview/PrvText.txt'),
+                            preview.encode('utf-8'))
+            os.replace(tmp_path, filepath)
+        except BaseException:
+            # 쓰다 만 임시 파일은 남기지 않음 (기존 출력 파일은 그대로 유지)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
 
         return filepath, filename
@@ -13,6 +13,7 @@ import base64
 import secrets
 import threading
 import webbrowser
+from functools import lru_cache
 from urllib.parse import urlencode, parse_qs, urlparse
 from http.server import HTTPServer, BaseHTTPRequestHandler
 
@@ -48,21 +49,36 @@ def generate_code_challenge(verifier):
 # 토큰 저장/로드
 # ============================================================
 def save_tokens(token_data):
-    """토큰을 파일에 저장"""
+    """토큰을 파일에 저장 (다른 스레드가 쓰다 만 파일을 읽지 않도록 교체 방식)"""
     token_data['saved_at'] = time.time()
-    with open(TOKEN_FILE, 'w') as f:
+    tmp_path = TOKEN_FILE + '.tmp'
+    with open(tmp_path, 'w') as f:
         json.dump(token_data, f)
+    os.replace(tmp_path, TOKEN_FILE)
+
+
+# 파싱된 토큰 캐시 (token_data.json 의 mtime/크기가 바뀔 때만 다시 읽음)
+_token_cache = {'key': None, 'data': None}
+_token_cache_lock = threading.Lock()
 
 
 def load_tokens():
     """저장된 토큰 로드"""
-    if not os.path.exists(TOKEN_FILE):
-        return None
     try:
-        with open(TOKEN_FILE, 'r') as f:
-            return json.load(f)
-    except Exception:
+        st = os.stat(TOKEN_FILE)
+    except OSError:
         return None
+    key = (st.st_mtime_ns, st.st_size)
+    with _token_cache_lock:
+        if _token_cache['key'] != key:
+            try:
+                with open(TOKEN_FILE, 'r') as f:
+                    data = json.load(f)
+            except Exception:
+                return None
+            _token_cache['key'] = key
+            _token_cache['data'] = data
+        return dict(_token_cache['data'])
 
 
 def clear_tokens():
@@ -111,6 +127,9 @@ def refresh_access_token(refresh_token):
 # ============================================================
 # 유효한 액세스 토큰 가져오기
 # ============================================================
+_refresh_lock = threading.Lock()
+
+
 def get_valid_access_token():
     """유효한 access_token 반환. 필요하면 자동 갱신."""
     token_data = load_tokens()
@@ -120,12 +139,18 @@ def get_valid_access_token():
     if is_token_valid(token_data):
         return token_data['access_token']
 
-    # 갱신 시도
-    refresh_token = token_data.get('refresh_token')
-    if refresh_token:
-        new_data = refresh_access_token(refresh_token)
-        if new_data:
-            return new_data['access_token']
+    # 갱신 시도 (여러 스레드가 동시에 만료를 감지해도 refresh_token 은 한 번만 사용)
+    with _refresh_lock:
+        token_data = load_tokens()
+        if not token_data:
+            return None
+        if is_token_valid(token_data):
+            return token_data['access_token']
+        refresh_token = token_data.get('refresh_token')
+        if refresh_token:
+            new_data = refresh_access_token(refresh_token)
+            if new_data:
+                return new_data['access_token']
 
     return None
 
@@ -257,8 +282,9 @@ def start_oauth_flow():
         return {'success': False, 'error': f'토큰 교환 오류: {e}'}
 
 
+@lru_cache(maxsize=4)
 def extract_account_id(access_token):
-    """JWT access_token에서 chatgpt_account_id 추출"""
+    """JWT access_token에서 chatgpt_account_id 추출 (토큰 문자열 단위로 결과 캐시 - 요청마다 재디코딩 방지)"""
     try:
         # JWT의 payload 부분 디코딩 (서명 검증 없이)
         parts = access_token.split('.')
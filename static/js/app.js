@@ -149,34 +149,56 @@
     });
   }
 
+  // 진행 상태 반영 - 완료/실패로 끝났으면 true
+  function applyProgress(taskId, d) {
+    var msgEl  = document.getElementById('progressMessage');
+    var barEl  = document.getElementById('progressBar');
+    var detailEl = document.getElementById('progressDetail');
+
+    if (msgEl) msgEl.textContent = d.message || '';
+    if (d.total_steps > 0 && barEl) {
+      var pct = Math.round((d.step / d.total_steps) * 100);
+      barEl.style.width = pct + '%';
+    }
+    if (detailEl) detailEl.textContent = d.step + ' / ' + d.total_steps + ' 단계';
+
+    if (d.status === 'completed') {
+      window.location.href = '/result/' + taskId;
+      return true;
+    } else if (d.status === 'error') {
+      var overlay = document.getElementById('progressOverlay');
+      if (overlay) overlay.style.display = 'none';
+      alert('생성 실패: ' + d.message);
+      return true;
+    }
+    return false;
+  }
+
   function pollProgress(taskId) {
+    // 서버가 상태가 바뀔 때만 보내주는 SSE 우선, 지원하지 않거나 끊기면 폴링으로 전환
+    if (window.EventSource) {
+      var source = new EventSource('/api/progress_stream/' + taskId);
+      source.onmessage = function(e) {
+        var json = JSON.parse(e.data);
+        if (!json.success) return;
+        if (applyProgress(taskId, json.data)) source.close();
+      };
+      source.onerror = function() {
+        source.close();
+        pollProgressInterval(taskId);
+      };
+      return;
+    }
+    pollProgressInterval(taskId);
+  }
+
+  function pollProgressInterval(taskId) {
     var timer = setInterval(async function() {
       try {
         var res = await fetch('/api/progress/' + taskId);
         var json = await res.json();
         if (!json.success) return;
-
-        var d = json.data;
-        var msgEl  = document.getElementById('progressMessage');
-        var barEl  = document.getElementById('progressBar');
-        var detailEl = document.getElementById('progressDetail');
-
-        if (msgEl) msgEl.textContent = d.message || '';
-        if (d.total_steps > 0 && barEl) {
-          var pct = Math.round((d.step / d.total_steps) * 100);
-          barEl.style.width = pct + '%';
-        }
-        if (detailEl) detailEl.textContent = d.step + ' / ' + d.total_steps + ' 단계';
-
-        if (d.status === 'completed') {
-          clearInterval(timer);
-          window.location.href = '/result/' + taskId;
-        } else if (d.status === 'error') {
-          clearInterval(timer);
-          var overlay = document.getElementById('progressOverlay');
-          if (overlay) overlay.style.display = 'none';
-          alert('생성 실패: ' + d.message);
-        }
+        if (applyProgress(taskId, json.data)) clearInterval(timer);
       } catch (e) { /* 네트워크 오류 무시 */ }
     }, 2000);
   }